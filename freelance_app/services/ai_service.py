@@ -11,7 +11,7 @@ from pathlib import Path
 # Add parent directory to path to import groq modules
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from src.groq_ttt import chat_completion
+from src.groq_ttt import chat_completion_sync
 from src.groq_compound import compound_chat
 from freelance_app.config import settings
 
@@ -53,7 +53,7 @@ class AIService:
         ]
 
         try:
-            response = chat_completion(
+            response = chat_completion_sync(
                 messages=messages,
                 model=self.model,
                 temperature=0.3,
@@ -98,7 +98,7 @@ class AIService:
         ]
 
         try:
-            response = chat_completion(
+            response = chat_completion_sync(
                 messages=messages,
                 model=self.model,
                 temperature=0.4,
@@ -155,7 +155,7 @@ Client Profile:
         ]
 
         try:
-            response = chat_completion(
+            response = chat_completion_sync(
                 messages=messages,
                 model=self.model,
                 temperature=0.2,
@@ -261,7 +261,7 @@ Examples:
         ]
 
         try:
-            response = chat_completion(
+            response = chat_completion_sync(
                 messages=messages,
                 model=self.model,
                 temperature=0.2,
@@ -320,7 +320,7 @@ Average Rating: {vetting_data.get('average_rating', 0)}
         ]
 
         try:
-            response = chat_completion(
+            response = chat_completion_sync(
                 messages=messages,
                 model=self.model,
                 temperature=0.5,
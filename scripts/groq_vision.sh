@@ -58,11 +58,11 @@ parent_dir = os.path.dirname('$PROJECT_ROOT')
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from src.groq_vision import analyze_image
+from src.groq_vision import analyze_image_sync
 from mcp.types import TextContent
 
-result = analyze_image(
-    input_file_path='$IMAGE_FILE',
+result = analyze_image_sync(
+    input_source='$IMAGE_FILE',
     prompt='$PROMPT',
     temperature=$TEMPERATURE,
     max_tokens=$MAX_TOKENS,
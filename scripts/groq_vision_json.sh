@@ -56,10 +56,10 @@ printf "# Add project root and parent directory to Python path\n" >> "$TEMP_SCRI
 printf "sys.path.insert(0, '%s')\n" "$PROJECT_ROOT" >> "$TEMP_SCRIPT"
 printf "parent_dir = os.path.dirname('%s')\n" "$PROJECT_ROOT" >> "$TEMP_SCRIPT"
 printf "if parent_dir not in sys.path:\n    sys.path.insert(0, parent_dir)\n\n" >> "$TEMP_SCRIPT"
-printf "from src.groq_vision import analyze_image_json\n" >> "$TEMP_SCRIPT"
+printf "from src.groq_vision import analyze_image_json_sync\n" >> "$TEMP_SCRIPT"
 printf "from mcp.types import TextContent\n\n" >> "$TEMP_SCRIPT"
-printf "result = analyze_image_json(\n" >> "$TEMP_SCRIPT"
-printf "    input_file_path='%s',\n" "$IMAGE_FILE" >> "$TEMP_SCRIPT"
+printf "result = analyze_image_json_sync(\n" >> "$TEMP_SCRIPT"
+printf "    input_source='%s',\n" "$IMAGE_FILE" >> "$TEMP_SCRIPT"
 printf "    prompt=\"%s\",\n" "$PROMPT" >> "$TEMP_SCRIPT"
 printf "    temperature=%s,\n" "$TEMPERATURE" >> "$TEMP_SCRIPT"
 printf "    max_tokens=%s,\n" "$MAX_TOKENS" >> "$TEMP_SCRIPT"
@@ -2,6 +2,7 @@
 
 # example: ./scripts/test.sh
 # example: ./scripts/test.sh --integration
+# example: ./scripts/test.sh --serial
 
 # Load environment variables if .env file exists
 if [ -f "../.env" ]; then
@@ -15,6 +16,7 @@ COVERAGE=true
 VERBOSE=false
 FAIL_FAST=false
 RUN_INTEGRATION=false
+PARALLEL=true
 
 # Process command-line arguments
 while [[ $# -gt 0 ]]; do
@@ -35,9 +37,13 @@ while [[ $# -gt 0 ]]; do
       RUN_INTEGRATION=true
       shift
       ;;
+    --serial|-s)
+      PARALLEL=false
+      shift
+      ;;
     *)
       echo "Unknown option: $1"
-      echo "Usage: ./test.sh [--no-coverage] [--verbose|-v] [--fail-fast|-f] [--integration|-i]"
+      echo "Usage: ./test.sh [--no-coverage] [--verbose|-v] [--fail-fast|-f] [--integration|-i] [--serial|-s]"
       exit 1
       ;;
   esac
@@ -63,6 +69,11 @@ if [ "$RUN_INTEGRATION" = false ]; then
   CMD="$CMD -m \"not integration\""
 fi
 
+# Spread the mocked tests across all cores (pytest-xdist); live API tests stay serial
+if [ "$PARALLEL" = true ] && [ "$RUN_INTEGRATION" = false ]; then
+  CMD="$CMD -n auto"
+fi
+
 # Check if GROQ_API_KEY is set when running integration tests
 if [ "$RUN_INTEGRATION" = true ] && [ -z "$GROQ_API_KEY" ]; then
   echo "Error: GROQ_API_KEY must be set to run integration tests"
@@ -1,6 +1,6 @@
 import os
-import httpx
-from typing import Literal, Optional, List, Dict, Union
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal, Optional, List, Dict, Union
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP, Context, Image
 from mcp.types import TextContent
@@ -23,6 +23,7 @@ from src.groq_stt import (
 from src.groq_vision import (
     analyze_image as core_analyze_image,
     analyze_image_json as core_analyze_image_json,
+    aclose_client as close_vision_client,
     VISION_MODELS,
     DEFAULT_MODEL
 )
@@ -30,6 +31,7 @@ from src.groq_vision import (
 # Import the TTT functions
 from src.groq_ttt import (
     chat_completion as core_chat_completion,
+    aclose_client as close_ttt_client,
     list_chat_models as core_list_chat_models
 )
 
@@ -59,17 +61,17 @@ base_path = os.getenv("BASE_OUTPUT_PATH")
 if not groq_api_key:
     raise ValueError("GROQ_API_KEY environment variable is required")
 
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-)
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Close the shared async Groq clients when the server shuts down"""
+    try:
+        yield
+    finally:
+        await close_ttt_client()
+        await close_vision_client()
 
 # Create an MCP server
-mcp = FastMCP("groq-mcp")
+mcp = FastMCP("groq-mcp", lifespan=lifespan)
 
 
 
@@ -224,13 +226,14 @@ def list_stt_models() -> TextContent:
         max_tokens: Maximum number of tokens to generate in the response
         output_directory: Optional directory to save output file (only used if save_to_file is True)
         save_to_file: Whether to save the description to a file (defaults to False)
+        save_full_response: Also save the full API response as JSON (only used if save_to_file is True)
         ctx: (optional) MCP Context for resource access and progress reporting
         return_image: If True, return the image as a FastMCP Image object (default False)
     Returns:
         Text content with the direct image description, or FastMCP Image if return_image is True, or path to output file if save_to_file is True
     """
 )
-def analyze_image(
+async def analyze_image(
     image: str,
     prompt: str = "What's in this image?",
     model: Literal["scout", "maverick"] = DEFAULT_MODEL,
@@ -238,6 +241,7 @@ def analyze_image(
     max_tokens: int = 1024,
     output_directory: Optional[str] = None,
     save_to_file: bool = False,
+    save_full_response: bool = False,
     ctx: Context = None,
     return_image: bool = False,
 ) -> Union[TextContent, Image]:
@@ -264,14 +268,15 @@ def analyze_image(
         else:
             input_source = image
             
-    result = core_analyze_image(
+    result = await core_analyze_image(
         input_source=input_source,
         prompt=prompt,
         model=model,
         temperature=temperature,
         max_tokens=max_tokens,
         output_directory=output_directory,
-        save_to_file=save_to_file
+        save_to_file=save_to_file,
+        save_full_response=save_full_response
     )
     if return_image and img_data is not None:
         return Image(data=img_data, format=mime_type.split("/")[-1] if mime_type else "png")
@@ -296,7 +301,7 @@ def analyze_image(
         Text content with the direct JSON response, or FastMCP Image if return_image is True, or path to output file if save_to_file is True
     """
 )
-def analyze_image_json(
+async def analyze_image_json(
     image: str,
     prompt: str = "Extract key information from this image as JSON",
     model: Literal["scout", "maverick"] = DEFAULT_MODEL,
@@ -330,7 +335,7 @@ def analyze_image_json(
         else:
             input_source = image
             
-    result = core_analyze_image_json(
+    result = await core_analyze_image_json(
         input_source=input_source,
         prompt=prompt,
         model=model,
@@ -360,12 +365,13 @@ def analyze_image_json(
         seed: Optional seed for deterministic results
         output_directory: Optional directory to save output file (only used if save_to_file is True)
         save_to_file: Whether to save the response to a file (defaults to False)
+        save_full_response: Also save the full API response as JSON (only used if save_to_file is True)
         
     Returns:
         Text content with the direct completion response, or path to output file if save_to_file is True
     """
 )
-def chat_completion(
+async def chat_completion(
     messages: List[Dict[str, str]],
     model: str = "llama-3.3-70b-versatile",
     temperature: float = 0.7,
@@ -377,8 +383,9 @@ def chat_completion(
     seed: Optional[int] = None,
     output_directory: Optional[str] = None,
     save_to_file: bool = False,
+    save_full_response: bool = False,
 ) -> TextContent:
-    return core_chat_completion(
+    return await core_chat_completion(
         messages=messages,
         model=model,
         temperature=temperature,
@@ -389,7 +396,8 @@ def chat_completion(
         response_format=response_format,
         seed=seed,
         output_directory=output_directory,
-        save_to_file=save_to_file
+        save_to_file=save_to_file,
+        save_full_response=save_full_response
     )
 
 @mcp.tool(
@@ -423,13 +431,17 @@ def play_audio(input_file_path: str) -> TextContent:
     This documentation provides detailed information about Groq's language models,
     their capabilities, parameters, and best practices for building with them.
     
+    Args:
+        section: Optional heading text (case-insensitive) to return only that section
+            instead of the whole document
+    
     Returns:
         Text content containing the full Groq documentation, useful for understanding
         model capabilities and building applications.
     """
 )
-def get_groq_documentation_full() -> TextContent:
-    return get_groq_full_docs()
+def get_groq_documentation_full(section: Optional[str] = None) -> TextContent:
+    return get_groq_full_docs(section)
 
 @mcp.tool(
     description="""Fetch and return the concise summary of Groq LLM documentation.
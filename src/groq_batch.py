@@ -6,28 +6,41 @@ JSONL file inputs and array-based inputs for better developer experience.
 """
 
 import os
-import json
+import atexit
+import functools
+import gzip
 import httpx
+import orjson
 from pathlib import Path
-from typing import List, Dict, Union, Optional
+from typing import Iterator, List, Dict, Tuple, Union, Optional
 from dotenv import load_dotenv
 from mcp.types import TextContent
+from src.utils import open_atomic, read_error_message, request_with_retry
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+# A batch entry is either a full request dict or a (custom_id, model, messages) tuple
+BatchRequest = Union[Dict, Tuple[str, str, List[Dict[str, str]]]]
 
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-)
+@functools.cache
+def _client() -> httpx.Client:
+    """Create the shared Groq client on first use rather than at import time"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+
+    # Create a custom httpx client with the Groq API key
+    client = httpx.Client(
+        base_url="https://api.groq.com/openai/v1",
+        headers={
+            "Authorization": f"Bearer {groq_api_key}",
+            "Content-Type": "application/json",
+        },
+        http2=True,
+    )
+    atexit.register(client.close)
+    return client
 
 def create_batch_request(
     custom_id: str,
@@ -45,18 +58,71 @@ def create_batch_request(
         }
     }
 
-def upload_batch_data(requests_data: Union[str, List[Dict]]) -> Dict:
-    """Upload batch data for processing, handling both file paths and request arrays"""
-    headers = groq_client.headers.copy()
+def _emit_batch_line(custom_id: str, model: str, messages_json: bytes) -> bytes:
+    """Serialize a chat completion batch entry straight to a JSONL line, skipping the dict"""
+    return (
+        b'{"custom_id":' + orjson.dumps(custom_id)
+        + b',"method":"POST","url":"/v1/chat/completions","body":{"model":' + orjson.dumps(model)
+        + b',"messages":' + messages_json + b'}}\n'
+    )
+
+def _iter_jsonl_lines(requests_data: List[BatchRequest]) -> Iterator[bytes]:
+    """
+    Yield one encoded JSONL line per batch entry
+
+    Few-shot batches pass the same messages list to many tuple entries, so each
+    distinct list is serialized once per call. Keying on id() is safe here:
+    requests_data keeps every list alive until the lines have been produced.
+    """
+    encoded: Dict[int, bytes] = {}
+    for request in requests_data:
+        if isinstance(request, tuple):
+            custom_id, model, messages = request
+            messages_json = encoded.get(id(messages))
+            if messages_json is None:
+                messages_json = encoded[id(messages)] = orjson.dumps(messages)
+            yield _emit_batch_line(custom_id, model, messages_json)
+        else:
+            yield orjson.dumps(request, option=orjson.OPT_APPEND_NEWLINE)
+
+def _post_batch_file(headers: httpx.Headers, files: Dict) -> httpx.Response:
+    """
+    Post a multipart batch upload, gzip-compressing the body when GROQ_BATCH_GZIP=1
+
+    JSONL batches repeat the same keys on every line, so they typically shrink
+    5-10x under even the fastest gzip level.
+    """
+    url = "https://api.groq.com/openai/v1/files"
+    if os.getenv("GROQ_BATCH_GZIP") != "1":
+        return httpx.post(url, headers=headers, files=files)
+
+    # Encode the multipart body first so the whole request body is compressed
+    request = httpx.Request("POST", url, headers=headers, files=files)
+    gzip_headers = request.headers.copy()
+    gzip_headers.pop("Content-Length", None)
+    gzip_headers["Content-Encoding"] = "gzip"
+    return httpx.post(
+        url,
+        headers=gzip_headers,
+        content=gzip.compress(request.read(), compresslevel=1)
+    )
+
+def upload_batch_data(requests_data: Union[str, List[BatchRequest]]) -> Dict:
+    """
+    Upload batch data for processing, handling both file paths and request arrays
+
+    Request arrays may mix full request dicts with (custom_id, model, messages)
+    tuples, which are encoded without building the intermediate dict.
+    """
+    headers = _client().headers.copy()
     headers.pop("Content-Type", None)
     
     if isinstance(requests_data, list):
-        # Convert array to JSONL string in memory
-        jsonl_content = "\n".join(json.dumps(request) for request in requests_data)
+        # Convert array to JSONL bytes in memory
+        jsonl_content = b"".join(_iter_jsonl_lines(requests_data))
         
-        response = httpx.post(
-            "https://api.groq.com/openai/v1/files",
-            headers=headers,
+        response = _post_batch_file(
+            headers,
             files={
                 "file": ("batch_requests.jsonl", jsonl_content, "application/x-jsonlines"),
                 "purpose": ("", "batch")
@@ -65,9 +131,8 @@ def upload_batch_data(requests_data: Union[str, List[Dict]]) -> Dict:
     else:
         # Handle file path input
         with open(requests_data, 'rb') as f:
-            response = httpx.post(
-                "https://api.groq.com/openai/v1/files",
-                headers=headers,
+            response = _post_batch_file(
+                headers,
                 files={
                     "file": (Path(requests_data).name, f, "application/x-jsonlines"),
                     "purpose": ("", "batch")
@@ -75,7 +140,7 @@ def upload_batch_data(requests_data: Union[str, List[Dict]]) -> Dict:
             )
     
     if response.status_code != 200:
-        raise Exception(f"Failed to upload file: {response.text}")
+        raise Exception(f"Failed to upload file: {read_error_message(response)}")
     
     return response.json()
 
@@ -84,7 +149,9 @@ def create_batch_job(
     completion_window: str = "24h"
 ) -> Dict:
     """Create a batch processing job"""
-    response = groq_client.post(
+    response = request_with_retry(
+        _client(),
+        "POST",
         "/batches",
         json={
             "input_file_id": file_id,
@@ -94,19 +161,42 @@ def create_batch_job(
     )
     
     if response.status_code != 200:
-        raise Exception(f"Failed to create batch job: {response.text}")
+        raise Exception(f"Failed to create batch job: {read_error_message(response)}")
     
     return response.json()
 
 def get_batch_status(batch_id: str) -> Dict:
     """Get the status of a batch job"""
-    response = groq_client.get(f"/batches/{batch_id}")
+    response = request_with_retry(_client(), "GET", f"/batches/{batch_id}")
     
     if response.status_code != 200:
-        raise Exception(f"Failed to get batch status: {response.text}")
+        raise Exception(f"Failed to get batch status: {read_error_message(response)}")
     
     return response.json()
 
+def _iter_batch_result_lines(file_id: str) -> Iterator[str]:
+    """Stream the raw JSONL lines of a batch results file"""
+    with _client().stream("GET", f"/files/{file_id}/content") as response:
+        if response.status_code != 200:
+            raise Exception(f"Failed to get batch results: {read_error_message(response)}")
+
+        for line in response.iter_lines():
+            if line:
+                yield line
+
+def iter_batch_results(file_id: str) -> Iterator[Dict]:
+    """
+    Stream batch results one record at a time
+
+    Args:
+        file_id: The output file ID from the completed batch
+
+    Yields:
+        Each decoded result, without buffering the whole results file
+    """
+    for line in _iter_batch_result_lines(file_id):
+        yield orjson.loads(line)
+
 def get_batch_results(file_id: str, output_path: Optional[str] = None) -> Union[str, TextContent]:
     """
     Retrieve batch results
@@ -119,31 +209,30 @@ def get_batch_results(file_id: str, output_path: Optional[str] = None) -> Union[
         Either a path to the saved results file or TextContent with the results
     """
     try:
-        # Get the content
-        response = groq_client.get(f"/files/{file_id}/content")
-        
-        if response.status_code != 200:
-            raise Exception(f"Failed to get batch results: {response.text}")
-
         # If output path is provided, try to save to file
         if output_path:
             try:
                 output_path = Path(output_path)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
+                with _client().stream("GET", f"/files/{file_id}/content") as response:
+                    if response.status_code != 200:
+                        raise Exception(f"Failed to get batch results: {read_error_message(response)}")
+                    # Stream straight to disk so large result files are never held in memory
+                    with open_atomic(output_path) as f:
+                        for chunk in response.iter_bytes(262144):
+                            f.write(chunk)
                 return str(output_path)
             except (OSError, PermissionError) as e:
                 # If file save fails, return content as text
+                results = "\n".join(_iter_batch_result_lines(file_id))
                 return TextContent(
                     type="text",
-                    text=f"Could not save to {output_path}, but here's the content:\n\n{response.text}"
+                    text=f"Could not save to {output_path}, but here's the content:\n\n{results}"
                 )
         
         # If no output path, just return the content
         return TextContent(
             type="text",
-            text=response.text
+            text="\n".join(_iter_batch_result_lines(file_id))
         )
             
     except Exception as e:
@@ -153,7 +242,7 @@ def get_batch_results(file_id: str, output_path: Optional[str] = None) -> Union[
         )
 
 def process_batch(
-    requests: Union[str, List[Dict]],
+    requests: Union[str, List[BatchRequest]],
     completion_window: str = "24h",
     output_path: Optional[str] = None
 ) -> TextContent:
@@ -162,6 +251,7 @@ def process_batch(
     
     Args:
         requests: Either a path to a JSONL file or a list of request dictionaries
+            (or (custom_id, model, messages) tuples)
         completion_window: Time window for batch completion (24h to 7d)
         output_path: Optional path to save results
     
@@ -186,10 +276,10 @@ def process_batch(
 
 def list_batches() -> Dict:
     """List all batch jobs"""
-    response = groq_client.get("/batches")
+    response = request_with_retry(_client(), "GET", "/batches")
     
     if response.status_code != 200:
-        raise Exception(f"Failed to list batches: {response.text}")
+        raise Exception(f"Failed to list batches: {read_error_message(response)}")
     
     return response.json()
 
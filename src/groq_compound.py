@@ -9,33 +9,45 @@ Each function that makes an API call is marked with a cost warning.
 """
 
 import os
-import json
+import sys
+import atexit
+import functools
 import httpx
-from typing import Literal, Optional, List, Dict, Any
+import orjson
+from typing import Iterator, Literal, Optional, List, Dict, Any
 from dotenv import load_dotenv
 from mcp.types import TextContent
 from src.utils import (
+    extract_message_content,
     make_error,
     make_output_path,
     make_output_file,
+    read_error_message,
+    write_file_atomic,
 )
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+@functools.cache
+def _client() -> httpx.Client:
+    """Create the shared Groq client on first use rather than at import time"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
 
-# Create a custom httpx client with the Groq API key and increased timeouts
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-    timeout=httpx.Timeout(60.0, read=300.0)  # 60s connect timeout, 300s read timeout
-)
+    # Create a custom httpx client with the Groq API key and increased timeouts
+    client = httpx.Client(
+        base_url="https://api.groq.com/openai/v1",
+        headers={
+            "Authorization": f"Bearer {groq_api_key}",
+            "Content-Type": "application/json",
+        },
+        timeout=httpx.Timeout(60.0, read=300.0),  # 60s connect timeout, 300s read timeout
+        http2=True,
+    )
+    atexit.register(client.close)
+    return client
 
 # Define available models
 COMPOUND_MODELS = [
@@ -44,46 +56,66 @@ COMPOUND_MODELS = [
     "compound-beta-deep",  # Uses qwen-2.5-32b for core reasoning
 ]
 
-def handle_stream_line(line: str, full_content: str, executed_tools: list, current_tool: Optional[dict]) -> tuple[str, list, Optional[dict]]:
+def _iter_sse_lines(response: httpx.Response) -> Iterator[bytes]:
+    """Split a streamed SSE body into raw byte lines, leaving decoding to the caller"""
+    pending = b""
+    for chunk in response.iter_bytes():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+def _echo(text: str) -> None:
+    """Write streamed text straight to stdout with a single UTF-8 encode"""
+    buffer = getattr(sys.stdout, "buffer", None)
+    if buffer is None:
+        print(text, end="", flush=True)
+        return
+    buffer.write(text.encode("utf-8"))
+    buffer.flush()
+
+def handle_stream_line(line: bytes, full_content: str, executed_tools: list, current_tool: Optional[dict]) -> tuple[str, list, Optional[dict]]:
     """Helper function to handle a single stream line"""
-    if not line or line.startswith(":"):
+    # Blank lines and ":" keep-alives are skipped without ever being decoded
+    if line[:6] != b"data: ":
         return full_content, executed_tools, current_tool
+
+    try:
+        data = orjson.loads(memoryview(line)[6:])  # Skip "data: " prefix
+    except orjson.JSONDecodeError:
+        return full_content, executed_tools, current_tool  # Skip invalid JSON lines, e.g. [DONE]
+
+    if "choices" in data:
+        delta = data["choices"][0].get("delta", {})
         
-    if line.startswith("data: "):
-        try:
-            data = json.loads(line[6:])  # Skip "data: " prefix
-            if "choices" in data:
-                delta = data["choices"][0].get("delta", {})
-                
-                # Handle content
-                if "content" in delta:
-                    content = delta["content"]
-                    print(content, end="", flush=True)
-                    full_content += content
-                
-                # Handle reasoning
-                if "reasoning" in delta:
-                    reasoning = delta["reasoning"]
-                    print(reasoning, end="", flush=True)
-                    full_content += reasoning
-                
-                # Handle executed tools
-                if "executed_tools" in delta:
-                    tools = delta["executed_tools"]
-                    for tool in tools:
-                        if current_tool and "output" in tool:
-                            # Update existing tool with output
-                            current_tool.update(tool)
-                            executed_tools.append(current_tool)
-                            current_tool = None
-                            print(f"\nTool output received: {tool['output']}\n", flush=True)
-                        else:
-                            # New tool execution started
-                            current_tool = tool
-                            print(f"\nExecuting tool: {tool['type']} with args: {tool['arguments']}\n", flush=True)
-                            
-        except json.JSONDecodeError:
-            pass  # Skip invalid JSON lines
+        # Handle content
+        if "content" in delta:
+            content = delta["content"]
+            _echo(content)
+            full_content += content
+        
+        # Handle reasoning
+        if "reasoning" in delta:
+            reasoning = delta["reasoning"]
+            _echo(reasoning)
+            full_content += reasoning
+        
+        # Handle executed tools
+        if "executed_tools" in delta:
+            tools = delta["executed_tools"]
+            for tool in tools:
+                if current_tool and "output" in tool:
+                    # Update existing tool with output
+                    current_tool.update(tool)
+                    executed_tools.append(current_tool)
+                    current_tool = None
+                    print(f"\nTool output received: {tool['output']}\n", flush=True)
+                else:
+                    # New tool execution started
+                    current_tool = tool
+                    print(f"\nExecuting tool: {tool['type']} with args: {tool['arguments']}\n", flush=True)
             
     return full_content, executed_tools, current_tool
 
@@ -111,9 +143,9 @@ def compound_chat(
     if model not in COMPOUND_MODELS:
         make_error(f"Model '{model}' not found. Available models are: {', '.join(COMPOUND_MODELS)}")
     
-    # Validate messages format
-    for msg in messages:
-        if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
+    # Validate messages format (skipped under python -O for long chat histories)
+    if __debug__:
+        if not all(isinstance(msg, dict) and 'role' in msg and 'content' in msg for msg in messages):
             make_error("Each message must be a dictionary with 'role' and 'content' keys")
     
     # Prepare the request payload
@@ -124,101 +156,47 @@ def compound_chat(
     }
     
     try:
-        # Create a client with appropriate timeout for streaming
+        # Use a longer read timeout for streaming
         timeout = httpx.Timeout(60.0, read=300.0) if stream else httpx.Timeout(60.0)
+        client = _client()
         
-        with httpx.Client(
-            base_url="https://api.groq.com/openai/v1",
-            headers={
-                "Authorization": f"Bearer {groq_api_key}",
-                "Content-Type": "application/json",
-                "Accept": "text/event-stream" if stream else "application/json"
-            },
-            timeout=timeout
-        ) as client:
-            
-            if stream:
-                with client.stream("POST", "/chat/completions", json=payload) as response:
-                    response.raise_for_status()
-                    
-                    # Handle streaming response
-                    full_content = ""
-                    executed_tools = []
-                    current_tool = None
-                    
-                    try:
-                        for line in response.iter_lines():
-                            if not line or line.startswith(":"):
-                                continue
-                            if line.startswith("data: "):
-                                try:
-                                    data = json.loads(line[6:])  # Skip "data: " prefix
-                                    if "choices" in data:
-                                        delta = data["choices"][0].get("delta", {})
-                                        
-                                        # Handle content
-                                        if "content" in delta:
-                                            content = delta["content"]
-                                            print(content, end="", flush=True)
-                                            full_content += content
-                                        
-                                        # Handle reasoning
-                                        if "reasoning" in delta:
-                                            reasoning = delta["reasoning"]
-                                            print(reasoning, end="", flush=True)
-                                            full_content += reasoning
-                                        
-                                        # Handle executed tools
-                                        if "executed_tools" in delta:
-                                            tools = delta["executed_tools"]
-                                            for tool in tools:
-                                                if current_tool and "output" in tool:
-                                                    # Update existing tool with output
-                                                    current_tool.update(tool)
-                                                    executed_tools.append(current_tool)
-                                                    current_tool = None
-                                                    print(f"\nTool output received: {tool['output']}\n", flush=True)
-                                                else:
-                                                    # New tool execution started
-                                                    current_tool = tool
-                                                    print(f"\nExecuting tool: {tool['type']} with args: {tool['arguments']}\n", flush=True)
-                                                
-                                except json.JSONDecodeError:
-                                    continue
-                        
-                        print("\n")  # Add newline after streaming
-                        
-                    except httpx.ReadTimeout:
-                        # If we timeout but have content, we can still return it
-                        if full_content:
-                            print("\n\nStream timed out, but partial response was received.", flush=True)
-                        else:
-                            make_error("Stream timed out before receiving any content")
-                    except Exception as e:
-                        make_error(f"Error processing stream: {str(e)}")
-                    
-                    # Format the final response
-                    response_text = full_content
-                    if executed_tools:
-                        response_text += "\n\nExecuted Tools:\n"
-                        for tool in executed_tools:
-                            response_text += f"\n- Tool {tool.get('index')}: {tool.get('type')}"
-                            response_text += f"\n  Arguments: {tool.get('arguments')}"
-                            if 'output' in tool:
-                                response_text += f"\n  Output: {tool.get('output')}"
-            else:
-                # Handle non-streaming response
-                response = client.post("/chat/completions", json=payload)
+        if stream:
+            with client.stream(
+                "POST",
+                "/chat/completions",
+                json=payload,
+                headers={"Accept": "text/event-stream"},
+                timeout=timeout,
+            ) as response:
+                if response.is_error:
+                    # Read the error body now; it cannot be read once the stream closes
+                    response.read()
                 response.raise_for_status()
-                response_data = response.json()
                 
-                assistant_message = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                executed_tools = response_data.get("executed_tools", [])
+                # Handle streaming response
+                full_content = ""
+                executed_tools = []
+                current_tool = None
                 
-                # Format the response text
-                response_text = assistant_message
+                try:
+                    for line in _iter_sse_lines(response):
+                        full_content, executed_tools, current_tool = handle_stream_line(
+                            line, full_content, executed_tools, current_tool
+                        )
+                    
+                    print("\n")  # Add newline after streaming
+                    
+                except httpx.ReadTimeout:
+                    # If we timeout but have content, we can still return it
+                    if full_content:
+                        print("\n\nStream timed out, but partial response was received.", flush=True)
+                    else:
+                        make_error("Stream timed out before receiving any content")
+                except Exception as e:
+                    make_error(f"Error processing stream: {str(e)}")
                 
-                # If there were executed tools, append them to the response
+                # Format the final response
+                response_text = full_content
                 if executed_tools:
                     response_text += "\n\nExecuted Tools:\n"
                     for tool in executed_tools:
@@ -226,43 +204,60 @@ def compound_chat(
                         response_text += f"\n  Arguments: {tool.get('arguments')}"
                         if 'output' in tool:
                             response_text += f"\n  Output: {tool.get('output')}"
+        else:
+            # Handle non-streaming response
+            response = client.post(
+                "/chat/completions",
+                json=payload,
+                headers={"Accept": "application/json"},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            response_data = response.json()
             
-            # Save to file if requested
-            if save_to_file:
-                output_path = make_output_path(output_directory, base_path)
-                output_file_path = make_output_file("groq-compound", "response", output_path, "txt")
-                output_file_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_file_path, "w") as f:
-                    f.write(response_text)
-                
-                if not stream:
-                    # Save the full JSON response for non-streaming requests
-                    json_file_path = make_output_file("groq-compound-full", "response", output_path, "json")
-                    with open(json_file_path, "w") as f:
-                        json.dump(response_data, f, indent=2)
-                    
-                    return TextContent(
-                        type="text",
-                        text=f"Success. Response saved as: {output_file_path}\nFull JSON response saved as: {json_file_path}\nModel used: {model}"
-                    )
+            assistant_message = extract_message_content(response_data)
+            executed_tools = response_data.get("executed_tools", [])
+            
+            # Format the response text
+            response_text = assistant_message
+            
+            # If there were executed tools, append them to the response
+            if executed_tools:
+                response_text += "\n\nExecuted Tools:\n"
+                for tool in executed_tools:
+                    response_text += f"\n- Tool {tool.get('index')}: {tool.get('type')}"
+                    response_text += f"\n  Arguments: {tool.get('arguments')}"
+                    if 'output' in tool:
+                        response_text += f"\n  Output: {tool.get('output')}"
+        
+        # Save to file if requested
+        if save_to_file:
+            output_path = make_output_path(output_directory, base_path)
+            output_file_path = make_output_file("groq-compound", "response", output_path, "txt")
+            write_file_atomic(output_file_path, response_text)
+            
+            if not stream:
+                # Save the full JSON response for non-streaming requests
+                json_file_path = make_output_file("groq-compound-full", "response", output_path, "json")
+                write_file_atomic(json_file_path, orjson.dumps(response_data))  # Compact; groq-pretty formats it
                 
                 return TextContent(
                     type="text",
-                    text=f"Success. Response saved as: {output_file_path}\nModel used: {model}"
-                )
-            else:
-                return TextContent(
-                    type="text",
-                    text=response_text
+                    text=f"Success. Response saved as: {output_file_path}\nFull JSON response saved as: {json_file_path}\nModel used: {model}"
                 )
-                    
+            
+            return TextContent(
+                type="text",
+                text=f"Success. Response saved as: {output_file_path}\nModel used: {model}"
+            )
+        else:
+            return TextContent(
+                type="text",
+                text=response_text
+            )
+                
     except httpx.HTTPStatusError as e:
-        try:
-            error_data = e.json()
-            error_message = error_data.get("error", {}).get("message", f"HTTP Error: {e.response.status_code}")
-        except Exception:
-            error_message = f"HTTP Error: {e.response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(e.response)}")
     except httpx.ReadTimeout:
         make_error("Request timed out. For streaming responses, consider using the non-streaming version or try again.")
     except Exception as e:
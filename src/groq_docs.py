@@ -4,31 +4,122 @@ Groq Documentation Module
 This module provides functions to fetch and return Groq documentation from their official sources.
 """
 
+import os
+import time
+import atexit
+import functools
 import httpx
+from pathlib import Path
 from typing import Optional
 from mcp.types import TextContent
-from src.utils import make_error
+from src.utils import (
+    make_error,
+    open_atomic,
+    retry_delay,
+    should_retry,
+    write_file_atomic,
+)
 
 # Documentation URLs
 GROQ_FULL_DOCS_URL = "https://console.groq.com/llms-full.txt"
 GROQ_SHORT_DOCS_URL = "https://console.groq.com/llms.txt"
 
+# Downloaded docs are kept here and revalidated with their ETag. The default is
+# per user, since a shared temp dir would let another local user plant the docs
+DOCS_CACHE_DIR = Path(os.path.expanduser(
+    os.getenv("GROQ_DOCS_CACHE_DIR", os.path.join(os.getenv("XDG_CACHE_HOME", "~/.cache"), "groq-mcp-docs"))
+))
+
+@functools.cache
+def _client() -> httpx.Client:
+    """Shared client so repeated documentation fetches reuse the connection"""
+    client = httpx.Client(http2=True)
+    atexit.register(client.close)
+    return client
+
+def _download_docs(url: str, cache_file: Path, max_retries: int = 5) -> None:
+    """
+    Refresh the cached copy of a documentation file unless the server reports it unchanged.
+
+    The body is streamed straight to disk, compressed with brotli or gzip on the wire.
+    """
+    etag_file = cache_file.with_suffix(cache_file.suffix + ".etag")
+    headers = {"Accept-Encoding": "br, gzip"}
+    if cache_file.exists() and etag_file.exists():
+        headers["If-None-Match"] = etag_file.read_text()
+
+    client = _client()
+    for attempt in range(max_retries):
+        response = client.send(client.build_request("GET", url, headers=headers), stream=True)
+        try:
+            if should_retry(response) and attempt < max_retries - 1:
+                time.sleep(retry_delay(response, attempt))
+                continue
+            if response.status_code == 304:
+                return
+            response.raise_for_status()
+
+            with open_atomic(cache_file) as f:
+                for chunk in response.iter_bytes(262144):
+                    f.write(chunk)
+            etag = response.headers.get("ETag")
+            if etag:
+                write_file_atomic(etag_file, etag)
+            else:
+                etag_file.unlink(missing_ok=True)
+            return
+        finally:
+            response.close()
+
 def fetch_groq_docs(url: str) -> str:
     """
     Helper function to fetch documentation from a URL.
     """
     try:
-        response = httpx.get(url)
-        response.raise_for_status()
-        return response.text
+        cache_file = DOCS_CACHE_DIR / url.rsplit("/", 1)[-1]
+        _download_docs(url, cache_file)
+        return cache_file.read_text(encoding="utf-8")
     except Exception as e:
         make_error(f"Error fetching Groq documentation: {str(e)}")
 
-def get_groq_full_docs() -> TextContent:
+def _heading_level(line: str) -> int:
+    """Markdown heading level of a line, or 0 when it is not a heading"""
+    level = len(line) - len(line.lstrip("#"))
+    return level if 0 < level <= 6 and line[level:level + 1] in (" ", "\n", "") else 0
+
+def extract_section(docs: str, section: str) -> Optional[str]:
+    """
+    Return the markdown section whose heading contains `section` (case-insensitive).
+
+    The section runs until the next heading of the same or a higher level.
+    Lines inside fenced code blocks are never treated as headings.
+    """
+    needle = section.strip().lower()
+    start, level, in_fence = None, 0, False
+    lines = docs.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if line.startswith("```"):
+            in_fence = not in_fence
+            continue
+        heading = 0 if in_fence else _heading_level(line)
+        if not heading:
+            continue
+        if start is None:
+            if needle in line[heading:].lower():
+                start, level = i, heading
+        elif heading <= level:
+            return "".join(lines[start:i])
+    return None if start is None else "".join(lines[start:])
+
+def get_groq_full_docs(section: Optional[str] = None) -> TextContent:
     """
-    Fetch and return the full Groq documentation.
+    Fetch and return the full Groq documentation, or just one section of it.
     """
     docs = fetch_groq_docs(GROQ_FULL_DOCS_URL)
+    if section:
+        docs = extract_section(docs, section)
+        if docs is None:
+            make_error(f"Section '{section}' not found in the Groq documentation")
     return TextContent(
         type="text",
         text=docs
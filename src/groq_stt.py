@@ -9,9 +9,12 @@ Each function that makes an API call is marked with a cost warning.
 """
 
 import os
+import atexit
+import functools
 import json
 import httpx
 from pathlib import Path
+from types import MappingProxyType
 from typing import Literal, Optional, List, Union
 from dotenv import load_dotenv
 from mcp.types import TextContent
@@ -20,23 +23,27 @@ from src.utils import (
     make_output_path,
     make_output_file,
     handle_input_file,
+    read_error_message,
 )
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+@functools.cache
+def _client() -> httpx.Client:
+    """Create the shared Groq client on first use rather than at import time"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
 
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-)
+    # No default Content-Type: audio uploads are multipart
+    client = httpx.Client(
+        base_url="https://api.groq.com/openai/v1",
+        headers={"Authorization": f"Bearer {groq_api_key}"},
+        http2=True,
+    )
+    atexit.register(client.close)
+    return client
 
 # Define available models
 STT_MODELS = [
@@ -89,20 +96,11 @@ def transcribe_audio(
             files["timestamp_granularities[]"] = (None, granularity)
 
     # Make the API request
-    response = httpx.post(
-        "https://api.groq.com/openai/v1/audio/transcriptions",
-        headers={"Authorization": f"Bearer {groq_api_key}"},
-        files=files
-    )
+    response = _client().post("/audio/transcriptions", files=files)
     
     # Check for errors
     if response.status_code != 200:
-        try:
-            error_data = response.json()
-            error_message = error_data.get("error", {}).get("message", "Unknown error occurred")
-        except Exception:
-            error_message = f"HTTP Error: {response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(response)}")
     
     # Process the response
     if response_format == "text":
@@ -170,20 +168,11 @@ def translate_audio(
         files["prompt"] = (None, prompt)
     
     # Make the API request
-    response = httpx.post(
-        "https://api.groq.com/openai/v1/audio/translations",
-        headers={"Authorization": f"Bearer {groq_api_key}"},
-        files=files
-    )
+    response = _client().post("/audio/translations", files=files)
     
     # Check for errors
     if response.status_code != 200:
-        try:
-            error_data = response.json()
-            error_message = error_data.get("error", {}).get("message", "Unknown error occurred")
-        except Exception:
-            error_message = f"HTTP Error: {response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(response)}")
     
     # Process the response
     if response_format == "text":
@@ -211,40 +200,41 @@ def translate_audio(
             text=translation
         )
 
-def list_stt_models() -> TextContent:
-    models_info = {
-        "whisper-large-v3-turbo": {
-            "description": "A fine-tuned version of a pruned Whisper Large V3 designed for fast, multilingual transcription tasks.",
-            "cost_per_hour": "$0.04",
-            "languages": "Multilingual",
-            "transcription": "Yes",
-            "translation": "No",
-            "speed_factor": "216",
-            "word_error_rate": "12%"
-        },
-        "distil-whisper-large-v3-en": {
-            "description": "A distilled version of Whisper, designed for faster, lower cost English speech recognition.",
-            "cost_per_hour": "$0.02",
-            "languages": "English only",
-            "transcription": "Yes",
-            "translation": "No",
-            "speed_factor": "250",
-            "word_error_rate": "13%"
-        },
-        "whisper-large-v3": {
-            "description": "Provides state-of-the-art performance with high accuracy for multilingual transcription and translation tasks.",
-            "cost_per_hour": "$0.111",
-            "languages": "Multilingual",
-            "transcription": "Yes",
-            "translation": "Yes",
-            "speed_factor": "189",
-            "word_error_rate": "10.3%"
-        }
+# Model details shown by list_stt_models
+_MODELS_INFO = MappingProxyType({
+    "whisper-large-v3-turbo": {
+        "description": "A fine-tuned version of a pruned Whisper Large V3 designed for fast, multilingual transcription tasks.",
+        "cost_per_hour": "$0.04",
+        "languages": "Multilingual",
+        "transcription": "Yes",
+        "translation": "No",
+        "speed_factor": "216",
+        "word_error_rate": "12%"
+    },
+    "distil-whisper-large-v3-en": {
+        "description": "A distilled version of Whisper, designed for faster, lower cost English speech recognition.",
+        "cost_per_hour": "$0.02",
+        "languages": "English only",
+        "transcription": "Yes",
+        "translation": "No",
+        "speed_factor": "250",
+        "word_error_rate": "13%"
+    },
+    "whisper-large-v3": {
+        "description": "Provides state-of-the-art performance with high accuracy for multilingual transcription and translation tasks.",
+        "cost_per_hour": "$0.111",
+        "languages": "Multilingual",
+        "transcription": "Yes",
+        "translation": "Yes",
+        "speed_factor": "189",
+        "word_error_rate": "10.3%"
     }
-    
-    # Format the model information
+})
+
+def _format_models_text() -> str:
+    """Format the model details once; list_stt_models returns the cached text"""
     model_details = []
-    for model_id, info in models_info.items():
+    for model_id, info in _MODELS_INFO.items():
         model_details.append(
             f"Model: {model_id}\n"
             f"  Description: {info['description']}\n"
@@ -255,8 +245,9 @@ def list_stt_models() -> TextContent:
             f"  Real-time Speed Factor: {info['speed_factor']}\n"
             f"  Word Error Rate: {info['word_error_rate']}"
         )
-    
-    return TextContent(
-        type="text",
-        text="Available Groq Speech-to-Text Models:\n\n" + "\n\n".join(model_details)
-    ) 
\ No newline at end of file
+    return "Available Groq Speech-to-Text Models:\n\n" + "\n\n".join(model_details)
+
+_MODELS_TEXT = _format_models_text()
+
+def list_stt_models() -> TextContent:
+    return TextContent(type="text", text=_MODELS_TEXT)
@@ -10,6 +10,8 @@ Each function that makes an API call is marked with a cost warning.
 """
 
 import os
+import atexit
+import functools
 import httpx
 from typing import Literal
 from dotenv import load_dotenv
@@ -18,23 +20,32 @@ from src.utils import (
     make_error,
     make_output_path,
     make_output_file,
+    read_error_message,
+    request_with_retry,
+    write_file_atomic,
 )
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+@functools.cache
+def _client() -> httpx.Client:
+    """Create the shared Groq client on first use rather than at import time"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
 
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-)
+    # Create a custom httpx client with the Groq API key
+    client = httpx.Client(
+        base_url="https://api.groq.com/openai/v1",
+        headers={
+            "Authorization": f"Bearer {groq_api_key}",
+            "Content-Type": "application/json",
+        },
+        http2=True,
+    )
+    atexit.register(client.close)
+    return client
 
 # Define available voices
 ENGLISH_VOICES = [
@@ -77,7 +88,9 @@ def text_to_speech(
     output_file_path = make_output_file("groq-tts", text[:30], output_path, "wav")
     
     # Prepare the request to Groq API
-    response = groq_client.post(
+    response = request_with_retry(
+        _client(),
+        "POST",
         "/audio/speech",
         json={
             "model": model,
@@ -88,14 +101,10 @@ def text_to_speech(
     )
     
     if response.status_code != 200:
-        error_data = response.json()
-        error_message = error_data.get("error", {}).get("message", "Unknown error occurred")
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(response, 'Unknown error occurred')}")
     
     # Save the audio file
-    output_file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file_path, "wb") as f:
-        f.write(response.content)
+    write_file_atomic(output_file_path, response.content)
     
     return TextContent(
         type="text",
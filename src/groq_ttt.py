@@ -9,33 +9,52 @@ Each function that makes an API call is marked with a cost warning.
 """
 
 import os
-import json
+import asyncio
 import httpx
+import orjson
+from types import MappingProxyType
 from pathlib import Path
-from typing import Literal, Optional, List, Dict, Any
+from typing import AsyncIterator, Literal, Optional, List, Dict, Any, Union
 from dotenv import load_dotenv
 from mcp.types import TextContent
 from src.utils import (
+    arequest_with_retry,
+    loop_cached,
+    run_sync,
+    extract_message_content,
     make_error,
     make_output_path,
     make_output_file,
+    read_error_message,
+    MCPError,
+    write_outputs,
 )
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+@loop_cached
+def _async_client() -> httpx.AsyncClient:
+    """Create the async Groq client for the running event loop on first use"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
 
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-)
+    # Create a custom httpx client with the Groq API key
+    return httpx.AsyncClient(
+        base_url="https://api.groq.com/openai/v1",
+        headers={
+            "Authorization": f"Bearer {groq_api_key}",
+            "Content-Type": "application/json",
+        },
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+async def aclose_client() -> None:
+    """Close the running loop's async client; called from the server lifespan on shutdown"""
+    await _async_client.aclose()
 
 # Define available models
 CHAT_MODELS = [
@@ -47,7 +66,64 @@ CHAT_MODELS = [
     "deepseek-r1-distill-llama-70b",  # DeepSeek's distilled model
 ]
 
-def chat_completion(
+def _validate_chat_args(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    frequency_penalty: float,
+    presence_penalty: float,
+) -> None:
+    """Raise an MCPError for arguments the chat completions API would reject"""
+    # Validate model
+    if model not in CHAT_MODELS:
+        make_error(f"Model '{model}' not found. Available models are: {', '.join(CHAT_MODELS)}")
+    
+    # Validate temperature and penalties, working out which one failed only when needed
+    if not (0.0 <= temperature <= 2.0 and -2.0 <= frequency_penalty <= 2.0 and -2.0 <= presence_penalty <= 2.0):
+        if not 0.0 <= temperature <= 2.0:
+            make_error("Temperature must be between 0.0 and 2.0")
+        if not -2.0 <= frequency_penalty <= 2.0:
+            make_error("Frequency penalty must be between -2.0 and 2.0")
+        make_error("Presence penalty must be between -2.0 and 2.0")
+    
+    # Validate messages in a single pass, stopping at the first bad one
+    if not messages:
+        make_error("Messages list cannot be empty")
+    if not all(isinstance(msg, dict) and 'role' in msg and 'content' in msg for msg in messages):
+        make_error("Each message must be a dictionary with 'role' and 'content' keys")
+
+def _build_payload(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    top_p: float,
+    frequency_penalty: float,
+    presence_penalty: float,
+    *,
+    max_completion_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, str]] = None,
+    seed: Optional[int] = None,
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """Build a chat completions request body, leaving out optional parameters that are unset"""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "top_p": top_p,
+        "frequency_penalty": frequency_penalty,
+        "presence_penalty": presence_penalty,
+        "stream": stream,
+    }
+    if max_completion_tokens is not None:
+        payload["max_completion_tokens"] = max_completion_tokens
+    if response_format is not None:
+        payload["response_format"] = response_format
+    if seed is not None:
+        payload["seed"] = seed
+    return payload
+
+async def chat_completion(
     messages: List[Dict[str, str]],
     model: str = "llama-3.3-70b-versatile",
     temperature: float = 0.7,
@@ -59,6 +135,7 @@ def chat_completion(
     seed: Optional[int] = None,
     output_directory: Optional[str] = None,
     save_to_file: bool = True,
+    save_full_response: bool = False,
 ) -> TextContent:
     """
     Generate a chat completion using Groq's API.
@@ -75,68 +152,34 @@ def chat_completion(
         seed: Optional seed for deterministic results
         output_directory: Directory to save output (if save_to_file is True)
         save_to_file: Whether to save the response to a file
+        save_full_response: Also save the full API response as JSON (if save_to_file is True)
     
     Returns:
         TextContent object with the completion or file path
     """
-    # Validate model
-    if model not in CHAT_MODELS:
-        make_error(f"Model '{model}' not found. Available models are: {', '.join(CHAT_MODELS)}")
-    
-    # Validate temperature
-    if not 0.0 <= temperature <= 2.0:
-        make_error("Temperature must be between 0.0 and 2.0")
-    
-    # Validate penalties
-    if not -2.0 <= frequency_penalty <= 2.0:
-        make_error("Frequency penalty must be between -2.0 and 2.0")
-    if not -2.0 <= presence_penalty <= 2.0:
-        make_error("Presence penalty must be between -2.0 and 2.0")
-    
-    # Validate messages
-    if not messages:
-        make_error("Messages list cannot be empty")
-    for msg in messages:
-        if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-            make_error("Each message must be a dictionary with 'role' and 'content' keys")
+    _validate_chat_args(messages, model, temperature, frequency_penalty, presence_penalty)
     
     # Prepare the request payload
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "top_p": top_p,
-        "frequency_penalty": frequency_penalty,
-        "presence_penalty": presence_penalty,
-        "stream": False
-    }
-    
-    # Add optional parameters
-    if max_completion_tokens is not None:
-        payload["max_completion_tokens"] = max_completion_tokens
-    if response_format is not None:
-        payload["response_format"] = response_format
-    if seed is not None:
-        payload["seed"] = seed
+    payload = _build_payload(
+        model, messages, temperature, top_p, frequency_penalty, presence_penalty,
+        max_completion_tokens=max_completion_tokens, response_format=response_format, seed=seed,
+    )
     
     # Make the API request
     try:
-        response = groq_client.post("/chat/completions", json=payload)
+        response = await arequest_with_retry(
+            _async_client(), "POST", "/chat/completions", content=orjson.dumps(payload)
+        )
         response.raise_for_status()
     except httpx.HTTPStatusError as e:
-        try:
-            error_data = e.response.json()
-            error_message = error_data.get("error", {}).get("message", f"HTTP Error: {e.response.status_code}")
-        except Exception:
-            error_message = f"HTTP Error: {e.response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(e.response)}")
     except Exception as e:
         make_error(f"Error calling Groq API: {str(e)}")
     
     # Process the response
     try:
         response_data = response.json()
-        completion = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+        completion = extract_message_content(response_data)
         
         if not completion:
             make_error("No completion was generated")
@@ -147,15 +190,13 @@ def chat_completion(
             # Use the first few words of the first message as part of the filename
             first_msg = messages[0]["content"][:30] if messages else "chat"
             output_file_path = make_output_file("groq-chat", first_msg, output_path, "txt")
+            # Optionally save the full response for reference
+            json_file_path = (
+                make_output_file("groq-chat-full", first_msg, output_path, "json") if save_full_response else None
+            )
             
-            output_file_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file_path, "w") as f:
-                f.write(completion)
-            
-            # Also save the full response for reference
-            json_file_path = make_output_file("groq-chat-full", first_msg, output_path, "json")
-            with open(json_file_path, "w") as f:
-                json.dump(response_data, f, indent=2)
+            # Write off the event loop so concurrent requests keep flowing
+            await asyncio.to_thread(write_outputs, output_file_path, completion, json_file_path, response_data)
             
             return TextContent(
                 type="text",
@@ -170,56 +211,148 @@ def chat_completion(
     except Exception as e:
         make_error(f"Error processing response: {str(e)}")
 
-def list_chat_models() -> TextContent:
-    """List all available models for Groq's chat completion service."""
-    models_info = {
-        "llama-3.3-70b-versatile": {
-            "description": "A versatile model suitable for a wide range of tasks, offering a good balance of performance and speed.",
-            "context_length": "8192 tokens",
-            "best_for": "General purpose tasks, chat, and reasoning",
-            "relative_speed": "Fast",
-            "relative_quality": "High"
-        },
-        "mistral-saba-24b": {
-            "description": "An Arabic language model based on Mistral architecture, optimized for Arabic text processing and generation.",
-            "context_length": "8192 tokens",
-            "best_for": "Arabic language tasks, multilingual content with Arabic focus",
-            "relative_speed": "Medium",
-            "relative_quality": "High for Arabic"
-        },
-        "gemma2-9b-it": {
-            "description": "A smaller, faster model suitable for simpler tasks and rapid prototyping.",
-            "context_length": "8192 tokens",
-            "best_for": "Quick responses, simple tasks",
-            "relative_speed": "Very Fast",
-            "relative_quality": "Good"
-        },
-        "meta-llama/llama-4-scout-17b-16e-instruct": {
-            "description": "Meta's Llama 4 Scout model, optimized for instruction following with extended context.",
-            "context_length": "131,072 tokens",
-            "best_for": "Long-form content, complex instructions",
-            "relative_speed": "Medium",
-            "relative_quality": "Very High"
-        },
-        "meta-llama/llama-4-maverick-17b-128e-instruct": {
-            "description": "Meta's Llama 4 Maverick model, designed for advanced instruction following with extensive context.",
-            "context_length": "131,072 tokens",
-            "best_for": "Long-form content, complex reasoning",
-            "relative_speed": "Medium",
-            "relative_quality": "Very High"
-        },
-        "deepseek-r1-distill-llama-70b": {
-            "description": "DeepSeek's distilled version of Llama, optimized for efficiency while maintaining quality.",
-            "context_length": "128,000 tokens",
-            "best_for": "General purpose tasks with long context",
-            "relative_speed": "Fast",
-            "relative_quality": "High"
-        }
-    }
+def chat_completion_sync(*args: Any, **kwargs: Any) -> TextContent:
+    """Blocking chat_completion for synchronous callers such as scripts and services"""
+    async def main() -> TextContent:
+        try:
+            return await chat_completion(*args, **kwargs)
+        finally:
+            await aclose_client()
+    return run_sync(main)
+
+async def chat_completion_stream(
+    messages: List[Dict[str, str]],
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.7,
+    max_completion_tokens: Optional[int] = None,
+    top_p: float = 1.0,
+    frequency_penalty: float = 0.0,
+    presence_penalty: float = 0.0,
+    response_format: Optional[Dict[str, str]] = None,
+    seed: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion from Groq's API, yielding content as it arrives.
+    
+    Takes the same generation arguments as chat_completion. The first tokens
+    are available after one round-trip instead of after the whole completion
+    has been generated, and memory use does not grow with the output length.
+    
+    Yields:
+        Successive pieces of the completion text
+    """
+    _validate_chat_args(messages, model, temperature, frequency_penalty, presence_penalty)
     
-    # Format the model information
+    payload = _build_payload(
+        model, messages, temperature, top_p, frequency_penalty, presence_penalty,
+        max_completion_tokens=max_completion_tokens, response_format=response_format, seed=seed, stream=True,
+    )
+    
+    try:
+        async with _async_client().stream("POST", "/chat/completions", content=orjson.dumps(payload)) as response:
+            if response.is_error:
+                await response.aread()
+                make_error(f"Groq API error: {read_error_message(response)}")
+            
+            async for line in response.aiter_lines():
+                # Skip blank lines and ":" keep-alives between events
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                choices = orjson.loads(data).get("choices")
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+    except MCPError:
+        raise
+    except Exception as e:
+        make_error(f"Error streaming from Groq API: {str(e)}")
+
+async def chat_completion_batch(
+    batches: List[List[Dict[str, str]]],
+    concurrency: int = 16,
+    **kwargs: Any,
+) -> List[Union[TextContent, BaseException]]:
+    """
+    Run one chat completion per message list concurrently.
+    
+    At most `concurrency` requests are in flight at once, which keeps large
+    batches under Groq's per-minute rate limits. Results come back in input
+    order; a failed request (e.g. a 429) is returned as its exception
+    instead of cancelling the rest of the batch.
+    
+    Args:
+        batches: List of message lists, one per completion
+        concurrency: Maximum number of simultaneous requests
+        **kwargs: Any other chat_completion arguments (save_to_file is always False)
+    
+    Returns:
+        List of TextContent objects or exceptions, in the order of `batches`
+    """
+    if concurrency < 1:
+        make_error("Concurrency must be at least 1")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    kwargs.pop("save_to_file", None)
+    
+    async def run(messages: List[Dict[str, str]]) -> TextContent:
+        async with semaphore:
+            return await chat_completion(messages, save_to_file=False, **kwargs)
+    
+    return await asyncio.gather(*(run(messages) for messages in batches), return_exceptions=True)
+
+# Model details shown by list_chat_models
+_MODELS_INFO = MappingProxyType({
+    "llama-3.3-70b-versatile": {
+        "description": "A versatile model suitable for a wide range of tasks, offering a good balance of performance and speed.",
+        "context_length": "8192 tokens",
+        "best_for": "General purpose tasks, chat, and reasoning",
+        "relative_speed": "Fast",
+        "relative_quality": "High"
+    },
+    "mistral-saba-24b": {
+        "description": "An Arabic language model based on Mistral architecture, optimized for Arabic text processing and generation.",
+        "context_length": "8192 tokens",
+        "best_for": "Arabic language tasks, multilingual content with Arabic focus",
+        "relative_speed": "Medium",
+        "relative_quality": "High for Arabic"
+    },
+    "gemma2-9b-it": {
+        "description": "A smaller, faster model suitable for simpler tasks and rapid prototyping.",
+        "context_length": "8192 tokens",
+        "best_for": "Quick responses, simple tasks",
+        "relative_speed": "Very Fast",
+        "relative_quality": "Good"
+    },
+    "meta-llama/llama-4-scout-17b-16e-instruct": {
+        "description": "Meta's Llama 4 Scout model, optimized for instruction following with extended context.",
+        "context_length": "131,072 tokens",
+        "best_for": "Long-form content, complex instructions",
+        "relative_speed": "Medium",
+        "relative_quality": "Very High"
+    },
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {
+        "description": "Meta's Llama 4 Maverick model, designed for advanced instruction following with extensive context.",
+        "context_length": "131,072 tokens",
+        "best_for": "Long-form content, complex reasoning",
+        "relative_speed": "Medium",
+        "relative_quality": "Very High"
+    },
+    "deepseek-r1-distill-llama-70b": {
+        "description": "DeepSeek's distilled version of Llama, optimized for efficiency while maintaining quality.",
+        "context_length": "128,000 tokens",
+        "best_for": "General purpose tasks with long context",
+        "relative_speed": "Fast",
+        "relative_quality": "High"
+    }
+})
+
+def _format_models_text() -> str:
+    """Format the model details once; list_chat_models returns the cached text"""
     model_details = []
-    for model_id, info in models_info.items():
+    for model_id, info in _MODELS_INFO.items():
         model_details.append(
             f"Model: {model_id}\n"
             f"  Description: {info['description']}\n"
@@ -228,8 +361,10 @@ def list_chat_models() -> TextContent:
             f"  Relative Speed: {info['relative_speed']}\n"
             f"  Relative Quality: {info['relative_quality']}"
         )
-    
-    return TextContent(
-        type="text",
-        text="Available Groq Chat Models:\n\n" + "\n\n".join(model_details)
-    )
\ No newline at end of file
+    return "Available Groq Chat Models:\n\n" + "\n\n".join(model_details)
+
+_MODELS_TEXT = _format_models_text()
+
+def list_chat_models() -> TextContent:
+    """List all available models for Groq's chat completion service."""
+    return TextContent(type="text", text=_MODELS_TEXT)
@@ -9,38 +9,61 @@ Each function that makes an API call is marked with a cost warning.
 """
 
 import os
-import json
+import asyncio
+import functools
+import itertools
 import base64
+import hashlib
+import threading
 import httpx
+import orjson
+from collections import OrderedDict
 from pathlib import Path
 from typing import Literal, Optional, List, Union, Dict, Any
 from dotenv import load_dotenv
 from mcp.types import TextContent
 from src.utils import (
+    arequest_with_retry,
+    loop_cached,
+    run_sync,
+    extract_message_content,
     make_error,
     make_output_path,
     make_output_file,
+    read_error_message,
+    write_file_atomic,
+    write_outputs,
     handle_input_file,
     MCPError
 )
 from datetime import datetime
+from urllib.parse import urlparse
 
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
 base_path = os.getenv("BASE_OUTPUT_PATH")
 
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
-
-# Create a custom httpx client with the Groq API key
-groq_client = httpx.Client(
-    base_url="https://api.groq.com/openai/v1",
-    headers={
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json",
-    },
-    timeout=60.0,  # vision models may take longer to process
-)
+@loop_cached
+def _async_client() -> httpx.AsyncClient:
+    """Create the async Groq client for the running event loop on first use"""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+
+    # Create a custom httpx client with the Groq API key
+    return httpx.AsyncClient(
+        base_url="https://api.groq.com/openai/v1",
+        headers={
+            "Authorization": f"Bearer {groq_api_key}",
+            "Content-Type": "application/json",
+        },
+        timeout=httpx.Timeout(60.0, connect=5.0),  # vision models may take longer to process; fail fast on connect
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+async def aclose_client() -> None:
+    """Close the running loop's async client; called from the server lifespan on shutdown"""
+    await _async_client.aclose()
 
 # Supported models
 VISION_MODELS = {
@@ -49,6 +72,86 @@ VISION_MODELS = {
 }
 DEFAULT_MODEL = "scout"
 
+# Names for images without a file name: startup timestamp plus a per-process counter
+_STAMP = datetime.now().strftime('%Y%m%d_%H%M%S')
+_COUNTER = itertools.count()
+
+def _image_id() -> str:
+    """Unique suffix for generated image names, without a clock read per call"""
+    return f"{_STAMP}_{next(_COUNTER)}"
+
+def _output_id(file_name: str) -> str:
+    """
+    Name part for output files: the usual 5-character prefix plus a counter.
+
+    make_output_file alone only adds a per-second timestamp, so concurrent
+    analyses (analyze_images_batch) would otherwise overwrite each other.
+    """
+    return f"{file_name[:5]}_{next(_COUNTER)}"
+
+# MIME types by image file extension; anything else is sent as JPEG
+_MIME = {
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+# Characters allowed in a raw (unwrapped) base64 string
+_B64_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+# Recently encoded raw image bytes, keyed by content hash
+_BYTES_CACHE_SIZE = 32
+_bytes_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_bytes_cache_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=128)
+def _encode_file(path: str, mtime_ns: int, size: int) -> tuple[str, str]:
+    """
+    Read and base64-encode an image file into a data URI.
+
+    Cached on (path, mtime_ns, size) so repeated analyses of an unchanged
+    file skip the read and encode entirely.
+    """
+    file_path = Path(path)
+    # Read straight into a buffer of the known size, without an intermediate copy
+    buf = bytearray(size)
+    view = memoryview(buf)
+    filled = 0
+    with open(file_path, "rb", buffering=0) as image_file:
+        while filled < size:
+            n = image_file.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+    mime_type = _MIME.get(file_path.suffix.lower(), "image/jpeg")
+
+    data_uri = b"data:" + mime_type.encode() + b";base64," + base64.b64encode(view[:filled])
+    return data_uri.decode("ascii"), file_path.name
+
+def _encode_bytes(image: bytes) -> str:
+    """Base64-encode raw image bytes into a data URI, reusing recent results for identical content"""
+    key = hashlib.blake2b(image, digest_size=16).digest()
+    with _bytes_cache_lock:
+        data_uri = _bytes_cache.get(key)
+        if data_uri is not None:
+            _bytes_cache.move_to_end(key)
+            return data_uri
+
+    # TODO: Infer mime type properly if possible? Defaulting to jpeg for now.
+    data_uri = f"data:image/jpeg;base64,{base64.b64encode(image).decode('utf-8')}"
+    with _bytes_cache_lock:
+        _bytes_cache[key] = data_uri
+        if len(_bytes_cache) > _BYTES_CACHE_SIZE:
+            _bytes_cache.popitem(last=False)
+    return data_uri
+
+def _is_base64(text: str) -> bool:
+    """Check that a string only uses base64 characters, deleting them in C rather than looping per character"""
+    return text.isascii() and not text.encode("ascii").translate(None, _B64_CHARS)
+
 # Helper function to encode image bytes or read from path/URL
 def _prepare_image_content(input_source: Union[str, bytes]) -> tuple[str, str]:
     """
@@ -63,10 +166,9 @@ def _prepare_image_content(input_source: Union[str, bytes]) -> tuple[str, str]:
     if isinstance(input_source, bytes):
         # Input is raw bytes
         try:
-            base64_image = base64.b64encode(input_source).decode('utf-8')
-            # TODO: Infer mime type properly if possible? Defaulting to jpeg for now.
-            filename = f"uploaded_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}" 
-            return f"data:image/jpeg;base64,{base64_image}", filename
+            data_uri = _encode_bytes(input_source)
+            filename = f"uploaded_image_{_image_id()}" 
+            return data_uri, filename
         except Exception as e:
             make_error(f"Error encoding provided image bytes: {str(e)}")
             
@@ -77,16 +179,16 @@ def _prepare_image_content(input_source: Union[str, bytes]) -> tuple[str, str]:
                 # Extract mime type and filename
                 mime_type = input_source.split(';')[0].split(':')[1]
                 extension = mime_type.split('/')[1]
-                filename = f"base64_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+                filename = f"base64_image_{_image_id()}.{extension}"
                 return input_source, filename
             except Exception as e:
                 make_error(f"Error processing base64 data URI: {str(e)}")
                 
         # Check if input is a raw base64 string (without data URI prefix)
-        elif len(input_source) > 100 and all(c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=' for c in input_source):
+        elif len(input_source) > 100 and _is_base64(input_source):
             try:
                 # Default to JPEG for raw base64 strings
-                filename = f"base64_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpeg"
+                filename = f"base64_image_{_image_id()}.jpeg"
                 return f"data:image/jpeg;base64,{input_source}", filename
             except Exception as e:
                 make_error(f"Error processing base64 string: {str(e)}")
@@ -94,7 +196,7 @@ def _prepare_image_content(input_source: Union[str, bytes]) -> tuple[str, str]:
         # Input is a URL
         elif input_source.startswith(('http://', 'https://')):
             # Return URL directly, API handles fetching
-            filename = Path(input_source.split('?')[0]).name
+            filename = urlparse(input_source).path.rsplit('/', 1)[-1] or 'image'
             return input_source, filename # Return URL itself, not base64 data
             
         # Input is a file path
@@ -102,34 +204,16 @@ def _prepare_image_content(input_source: Union[str, bytes]) -> tuple[str, str]:
             # Handle local file path
             file_path = handle_input_file(input_source, image_content_check=True)
             try:
-                with open(file_path, "rb") as image_file:
-                    base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-                # TODO: Infer mime type from file extension? Defaulting to jpeg.
-                mime_type = "image/jpeg" # Basic default
-                if file_path.suffix.lower() == ".png":
-                    mime_type = "image/png"
-                elif file_path.suffix.lower() == ".gif":
-                    mime_type = "image/gif"
-                elif file_path.suffix.lower() == ".webp":
-                    mime_type = "image/webp"
-                elif file_path.suffix.lower() == ".bmp":
-                    mime_type = "image/bmp"
-                    
-                return f"data:{mime_type};base64,{base64_image}", file_path.name
+                # Re-encode only when the file has changed since it was last seen
+                stat = file_path.stat()
+                return _encode_file(str(file_path), stat.st_mtime_ns, stat.st_size)
             except Exception as e:
                 make_error(f"Error reading or encoding image file {file_path}: {str(e)}")
     else:
         make_error("Invalid input source type for image analysis.")
 
-def analyze_image(
-    input_source: Union[str, bytes],
-    prompt: str = "What's in this image?",
-    model: Literal["scout", "maverick"] = DEFAULT_MODEL,
-    temperature: float = 0.7,
-    max_tokens: int = 1024,
-    output_directory: Optional[str] = None,
-    save_to_file: bool = True,
-) -> TextContent:
+def _validate_vision_args(prompt: str, temperature: float, model: str) -> str:
+    """Validate the shared vision arguments and return the full model name"""
     # Validate prompt
     if not prompt or not prompt.strip():
         make_error("Prompt is required")
@@ -141,58 +225,64 @@ def analyze_image(
     # Validate and get model
     if model not in VISION_MODELS:
         make_error(f"Invalid model. Must be one of: {', '.join(VISION_MODELS.keys())}")
-    model_name = VISION_MODELS[model]
+    return VISION_MODELS[model]
 
-    # Prepare image data (handles path, URL, or bytes)
-    try:
-        image_url_data, file_name = _prepare_image_content(input_source)
-    except Exception as e:
-        make_error(f"Failed to prepare image content: {str(e)}")
-
-    # Construct payload content
-    content = [
-        {"type": "text", "text": prompt}
-    ]
-    
-    # Add the image data (either URL or base64 data URI)
-    content.append({
-        "type": "image_url",
-        "image_url": {
-            "url": image_url_data
-        }
-    })
-
-    # Prepare the request payload
+def _build_payload(
+    model_name: str,
+    prompt: str,
+    image_url_data: str,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool = False,
+) -> Dict[str, Any]:
+    """Build a single-turn vision request body from the prompt and image (URL or base64 data URI)"""
     payload = {
         "model": model_name,
         "messages": [
             {
                 "role": "user",
-                "content": content
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url_data}},
+                ]
             }
         ],
         "temperature": temperature,
         "max_completion_tokens": max_tokens,
         "stream": False
     }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
+
+async def _describe_image(
+    image_url_data: str,
+    file_name: str,
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: int,
+    output_directory: Optional[str],
+    save_to_file: bool,
+    save_full_response: bool,
+) -> TextContent:
+    """Send an already prepared image to the vision model and return or save its description"""
+    payload = _build_payload(model_name, prompt, image_url_data, temperature, max_tokens)
 
     # Make the API request
     try:
-        response = groq_client.post("/chat/completions", json=payload)
+        response = await arequest_with_retry(
+            _async_client(), "POST", "/chat/completions", content=orjson.dumps(payload)
+        )
         response.raise_for_status()
     except httpx.HTTPStatusError as e:
-        try:
-            error_data = e.response.json()
-            error_message = error_data.get("error", {}).get("message", f"HTTP Error: {e.response.status_code}")
-        except Exception:
-            error_message = f"HTTP Error: {e.response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(e.response)}")
     except Exception as e:
         make_error(f"Error calling Groq API: {str(e)}")
     
     # Process the response
     response_data = response.json()
-    description = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    description = extract_message_content(response_data)
     
     if not description:
         make_error("No description was generated")
@@ -200,16 +290,16 @@ def analyze_image(
     # Save the description to a file if requested
     if save_to_file:
         output_path = make_output_path(output_directory, base_path)
-        output_file_path = make_output_file("groq-vision", file_name, output_path, "txt")
-        
-        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file_path, "w") as f:
-            f.write(description)
+        output_id = _output_id(file_name)
+        output_file_path = make_output_file("groq-vision", output_id, output_path, "txt", full_id=True)
+        # Optionally save the full response for reference
+        json_file_path = (
+            make_output_file("groq-vision-full", output_id, output_path, "json", full_id=True)
+            if save_full_response else None
+        )
         
-        # Also save the full response for reference
-        json_file_path = make_output_file("groq-vision-full", file_name, output_path, "json")
-        with open(json_file_path, "w") as f:
-            json.dump(response_data, f, indent=2)
+        # Write off the event loop so concurrent requests keep flowing
+        await asyncio.to_thread(write_outputs, output_file_path, description, json_file_path, response_data)
         
         return TextContent(
             type="text",
@@ -221,27 +311,91 @@ def analyze_image(
             text=description
         )
 
-def analyze_image_json(
+async def analyze_image(
     input_source: Union[str, bytes],
-    prompt: str = "Extract key information from this image as JSON",
+    prompt: str = "What's in this image?",
     model: Literal["scout", "maverick"] = DEFAULT_MODEL,
-    temperature: float = 0.2,
+    temperature: float = 0.7,
     max_tokens: int = 1024,
     output_directory: Optional[str] = None,
     save_to_file: bool = True,
+    save_full_response: bool = False,
 ) -> TextContent:
-    # Validate prompt
-    if not prompt or not prompt.strip():
-        make_error("Prompt is required")
+    model_name = _validate_vision_args(prompt, temperature, model)
+
+    # Prepare image data (handles path, URL, or bytes)
+    try:
+        image_url_data, file_name = _prepare_image_content(input_source)
+    except Exception as e:
+        make_error(f"Failed to prepare image content: {str(e)}")
+
+    return await _describe_image(
+        image_url_data,
+        file_name,
+        prompt,
+        model_name,
+        temperature,
+        max_tokens,
+        output_directory,
+        save_to_file,
+        save_full_response,
+    )
+
+async def analyze_images_batch(
+    sources: List[Union[str, bytes]],
+    prompt: str = "What's in this image?",
+    model: Literal["scout", "maverick"] = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    output_directory: Optional[str] = None,
+    save_to_file: bool = False,
+    save_full_response: bool = False,
+    concurrency: int = 8,
+) -> List[Union[TextContent, BaseException]]:
+    """
+    Describe many images concurrently with the same prompt and model.
     
-    # Validate temperature
-    if temperature < 0.0 or temperature > 1.0:
-        make_error("Temperature must be between 0.0 and 1.0")
+    Each image is base64-encoded in a worker thread, so encoding overlaps with
+    requests already in flight. At most `concurrency` images are encoded or
+    awaiting a response at once. Results come back in input order, with a
+    failure for one image returned as its exception.
+    """
+    model_name = _validate_vision_args(prompt, temperature, model)
+    if concurrency < 1:
+        make_error("Concurrency must be at least 1")
     
-    # Validate and get model
-    if model not in VISION_MODELS:
-        make_error(f"Invalid model. Must be one of: {', '.join(VISION_MODELS.keys())}")
-    model_name = VISION_MODELS[model]
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def describe(source: Union[str, bytes]) -> TextContent:
+        async with semaphore:
+            try:
+                image_url_data, file_name = await asyncio.to_thread(_prepare_image_content, source)
+            except Exception as e:
+                make_error(f"Failed to prepare image content: {str(e)}")
+            return await _describe_image(
+                image_url_data,
+                file_name,
+                prompt,
+                model_name,
+                temperature,
+                max_tokens,
+                output_directory,
+                save_to_file,
+                save_full_response,
+            )
+    
+    return await asyncio.gather(*(describe(source) for source in sources), return_exceptions=True)
+
+async def analyze_image_json(
+    input_source: Union[str, bytes],
+    prompt: str = "Extract key information from this image as JSON",
+    model: Literal["scout", "maverick"] = DEFAULT_MODEL,
+    temperature: float = 0.2,
+    max_tokens: int = 1024,
+    output_directory: Optional[str] = None,
+    save_to_file: bool = True,
+) -> TextContent:
+    model_name = _validate_vision_args(prompt, temperature, model)
     
     # Prepare image data (handles path, URL, or bytes)
     try:
@@ -249,67 +403,36 @@ def analyze_image_json(
     except Exception as e:
         make_error(f"Failed to prepare image content: {str(e)}")
 
-    # Construct payload content
-    content = [
-        {"type": "text", "text": prompt}
-    ]
-
-    # Add the image data (either URL or base64 data URI)
-    content.append({
-        "type": "image_url",
-        "image_url": {
-            "url": image_url_data
-        }
-    })
-
-    # Prepare the request payload
-    payload = {
-        "model": model_name,
-        "messages": [
-            {
-                "role": "user",
-                "content": content
-            }
-        ],
-        "temperature": temperature,
-        "max_completion_tokens": max_tokens,
-        "response_format": {"type": "json_object"},
-        "stream": False
-    }
+    payload = _build_payload(model_name, prompt, image_url_data, temperature, max_tokens, json_mode=True)
 
     # Make the API request
     try:
-        response = groq_client.post("/chat/completions", json=payload)
+        response = await arequest_with_retry(
+            _async_client(), "POST", "/chat/completions", content=orjson.dumps(payload)
+        )
         response.raise_for_status()
     except httpx.HTTPStatusError as e:
-        try:
-            error_data = e.response.json()
-            error_message = error_data.get("error", {}).get("message", f"HTTP Error: {e.response.status_code}")
-        except Exception:
-            error_message = f"HTTP Error: {e.response.status_code}"
-        make_error(f"Groq API error: {error_message}")
+        make_error(f"Groq API error: {read_error_message(e.response)}")
     except Exception as e:
         make_error(f"Error calling Groq API: {str(e)}")
     
     # Process the response
     response_data = response.json()
-    json_response = response_data.get("choices", [{}])[0].get("message", {}).get("content", "{}")
+    json_response = extract_message_content(response_data, "{}")
     
     # Validate JSON response
     try:
-        parsed_json = json.loads(json_response)
-        json_response = json.dumps(parsed_json, indent=2)
-    except json.JSONDecodeError:
+        json_bytes = orjson.dumps(orjson.loads(json_response), option=orjson.OPT_INDENT_2)
+        json_response = json_bytes.decode()
+    except orjson.JSONDecodeError:
         make_error("Invalid JSON response received from the model")
     
     # Save the JSON response to a file if requested
     if save_to_file:
         output_path = make_output_path(output_directory, base_path)
-        output_file_path = make_output_file("groq-vision-json", file_name, output_path, "json")
+        output_file_path = make_output_file("groq-vision-json", _output_id(file_name), output_path, "json", full_id=True)
         
-        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file_path, "w") as f:
-            f.write(json_response)
+        await asyncio.to_thread(write_file_atomic, output_file_path, json_bytes)
         
         return TextContent(
             type="text",
@@ -320,3 +443,20 @@ def analyze_image_json(
             type="text",
             text=json_response
         ) 
+
+def _run_closing(tool, args: tuple, kwargs: dict) -> TextContent:
+    """Run an async vision tool from sync code, closing the loop's client afterwards"""
+    async def main() -> TextContent:
+        try:
+            return await tool(*args, **kwargs)
+        finally:
+            await aclose_client()
+    return run_sync(main)
+
+def analyze_image_sync(*args: Any, **kwargs: Any) -> TextContent:
+    """Blocking analyze_image for synchronous callers such as scripts"""
+    return _run_closing(analyze_image, args, kwargs)
+
+def analyze_image_json_sync(*args: Any, **kwargs: Any) -> TextContent:
+    """Blocking analyze_image_json for synchronous callers such as scripts"""
+    return _run_closing(analyze_image_json, args, kwargs)
@@ -0,0 +1,45 @@
+"""
+Pretty-print JSON files saved by the Groq MCP tools.
+
+Full responses are saved as compact JSON; run `groq-pretty file.json` to read one.
+"""
+
+import sys
+import argparse
+import orjson
+from pathlib import Path
+from src.utils import write_file_atomic
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Pretty-print JSON files saved by the Groq MCP tools")
+    parser.add_argument("files", nargs="+", type=Path, help="JSON files to format")
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Rewrite the files indented instead of printing them",
+    )
+    args = parser.parse_args(argv)
+
+    status = 0
+    for path in args.files:
+        try:
+            pretty = orjson.dumps(
+                orjson.loads(path.read_bytes()),
+                option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE,
+            )
+        except (OSError, orjson.JSONDecodeError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+            continue
+
+        if args.in_place:
+            write_file_atomic(path, pretty)
+        else:
+            sys.stdout.buffer.write(pretty)
+    sys.stdout.flush()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
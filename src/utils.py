@@ -1,13 +1,36 @@
 # Borrowed from https://github.com/elevenlabs/elevenlabs-mcp
 
 import os
+import time
+import random
+import stat
+import asyncio
+import functools
+import weakref
+import tempfile
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
+from typing import Awaitable, BinaryIO, Callable, Iterator, TypeVar
 from rapidfuzz import fuzz
-import soundfile as sf
-import sounddevice as sd
 from mcp.types import TextContent
 
+T = TypeVar("T")
+
+# Error bodies larger than this are not parsed as JSON
+MAX_ERROR_BODY_BYTES = 64 * 1024
+
+# Read once at import: os.umask can only be queried by setting it, which would
+# briefly change the mask for threads creating files at the same time
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Directories already created by ensure_dir, so repeated writes skip the mkdir
+_created_dirs: set[str] = set()
+
 class MCPError(Exception):
     pass
 
@@ -24,6 +47,10 @@ def play_audio(file_path: str) -> TextContent:
     # Validate and get the file path
     path = handle_input_file(file_path, audio_content_check=True)
     
+    # Imported lazily: loading PortAudio is slow and only needed for playback
+    import soundfile as sf
+    import sounddevice as sd
+    
     try:
         # Read the audio file
         data, samplerate = sf.read(path)
@@ -44,6 +71,199 @@ def make_error(error_text: str):
     raise MCPError(error_text)
 
 
+def read_error_message(response: httpx.Response, default: str | None = None) -> str:
+    """
+    Extract the API error message from an error response.
+
+    A parse and truncation guard: the body is only parsed when the response
+    says it is JSON and it is at most MAX_ERROR_BODY_BYTES, and the fallback
+    text is cut to 500 characters. Most callers pass already buffered
+    responses, so this does not bound memory for them; only an unread
+    streamed response (the batch result downloads) stops being read at the
+    cap. Returns the default when nothing could be read.
+    """
+    default = default or f"HTTP Error: {response.status_code}"
+    body = bytearray()
+    try:
+        for chunk in response.iter_bytes(8192):
+            body += chunk
+            if len(body) > MAX_ERROR_BODY_BYTES:
+                break
+    except httpx.StreamError:
+        # The body of a closed stream can no longer be read
+        return default
+
+    # Only parse complete JSON bodies; HTML error pages and truncated bodies go straight to the fallback
+    if "json" in response.headers.get("content-type", "") and len(body) <= MAX_ERROR_BODY_BYTES:
+        try:
+            return orjson.loads(body)["error"]["message"]
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            pass
+    return body[:500].decode("utf-8", "replace") or default
+
+
+
+def extract_message_content(response_data: dict, default: str = "") -> str:
+    """Return the first choice's message content from a chat completion response, or the default."""
+    try:
+        return response_data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return default
+
+def should_retry(response: httpx.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def retry_delay(response: httpx.Response, attempt: int, max_delay: float = 30.0) -> float:
+    """
+    Seconds to wait before retrying a rate limited or failed request.
+
+    Honors the server's Retry-After hint when it is given in seconds, otherwise
+    backs off exponentially. Jitter keeps concurrent callers from retrying in lockstep.
+    """
+    try:
+        delay = float(response.headers.get("Retry-After", 2 ** attempt))
+    except ValueError:
+        # Retry-After may also be an HTTP date
+        delay = 2 ** attempt
+    return min(delay, max_delay) + random.random() * 0.25
+
+
+def request_with_retry(
+    client: httpx.Client, method: str, url: str, *, max_retries: int = 5, **kwargs
+) -> httpx.Response:
+    """
+    Send a request, retrying 429 and 5xx responses with exponential backoff.
+
+    Returns the last response once it succeeds or retries are exhausted.
+    """
+    for attempt in range(max_retries):
+        response = client.request(method, url, **kwargs)
+        if not should_retry(response) or attempt == max_retries - 1:
+            return response
+        time.sleep(retry_delay(response, attempt))
+
+
+async def arequest_with_retry(
+    client: httpx.AsyncClient, method: str, url: str, *, max_retries: int = 5, **kwargs
+) -> httpx.Response:
+    """Async version of request_with_retry that sleeps without blocking the event loop."""
+    for attempt in range(max_retries):
+        response = await client.request(method, url, **kwargs)
+        if not should_retry(response) or attempt == max_retries - 1:
+            return response
+        await asyncio.sleep(retry_delay(response, attempt))
+
+
+def loop_cached(factory: Callable[[], httpx.AsyncClient]) -> Callable[[], httpx.AsyncClient]:
+    """
+    Cache one async client per running event loop.
+
+    Pooled connections belong to the loop that opened them, so a single
+    process-wide client breaks as soon as a second loop (another asyncio.run,
+    a new test loop) reuses it. The returned function also gets an `aclose`
+    coroutine that closes and forgets the current loop's client.
+    """
+    clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @functools.wraps(factory)
+    def get_client() -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = clients.get(loop)
+        if client is None:
+            client = clients[loop] = factory()
+        return client
+
+    async def aclose() -> None:
+        client = clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    get_client.aclose = aclose
+    return get_client
+
+
+def run_sync(main: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run an async tool call to completion from synchronous code.
+
+    Each call gets a fresh event loop. If the caller is already inside a running
+    loop (a sync service used from an async web handler), the loop runs on a
+    worker thread instead, blocking the caller just as a sync HTTP call would.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(main())
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(lambda: asyncio.run(main())).result()
+
+
+def ensure_dir(path: Path) -> None:
+    """Create a directory (and parents) once per process."""
+    key = str(path)
+    if key in _created_dirs:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    _created_dirs.add(key)
+
+
+@contextmanager
+def open_atomic(path: Path) -> Iterator[BinaryIO]:
+    """
+    Open a file for binary writing that only appears at `path` once fully written.
+
+    Data goes to a uniquely named temporary sibling that is moved into place
+    with os.replace, so a crash mid-write never leaves a truncated file behind
+    and concurrent writers of the same path never share a temporary file.
+    """
+    ensure_dir(path.parent)
+    try:
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    except FileNotFoundError:
+        # The directory was removed since it was cached
+        _created_dirs.discard(str(path.parent))
+        ensure_dir(path.parent)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp creates the file as 0600; give it the mode open() would
+            # have, or keep the mode of the file being replaced
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.fchmod(f.fileno(), mode)
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_file_atomic(path: Path, data: bytes | str) -> None:
+    """Atomically write text (as UTF-8) or bytes to `path`."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open_atomic(path) as f:
+        f.write(data)
+
+
+
+def write_outputs(
+    text_path: Path, text: str, json_path: Path | None = None, response_data: dict | None = None
+) -> None:
+    """
+    Write a text result and, optionally, the full JSON response it came from.
+
+    Async callers run this through a single asyncio.to_thread call, so both
+    writes and the JSON encode stay off the event loop.
+    """
+    write_file_atomic(text_path, text)
+    if json_path is not None:
+        write_file_atomic(json_path, orjson.dumps(response_data, option=orjson.OPT_INDENT_2))
+
 def is_file_writeable(path: Path) -> bool:
     if path.exists():
         return os.access(path, os.W_OK)
@@ -88,7 +308,7 @@ def make_output_path(
         make_error(f"Directory ({output_path}) is not writeable")
 
     # Create the directory if it doesn't exist
-    output_path.mkdir(parents=True, exist_ok=True)
+    ensure_dir(output_path)
 
     return output_path
 
@@ -0,0 +1,26 @@
+"""Shared helpers for reading the files the tools report as saved"""
+
+import re
+import orjson
+from pathlib import Path
+
+# The path runs to the end of its line, which in text-to-speech results also
+# carries ". Voice used: ...". Paths may contain spaces (BASE_OUTPUT_PATH=~/My Desktop)
+_SAVED = re.compile(r"saved as: (.+?)(?:\. Voice used: .*)?$", re.M)
+
+def extract_path(text):
+    """Return the first saved file named in a tool result"""
+    return Path(_SAVED.search(text).group(1))
+
+def read_output(text_blob):
+    """Return the first saved file named in a tool result and its decoded contents.
+
+    Reading the file fails with FileNotFoundError if it is missing, so no separate
+    exists() check is needed.
+    """
+    path = extract_path(text_blob)
+    return path, path.read_bytes().decode()
+
+def load_json(path):
+    """Parse a saved JSON file straight from its bytes"""
+    return orjson.loads(Path(path).read_bytes())
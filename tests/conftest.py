@@ -2,155 +2,203 @@ import pytest
 from pathlib import Path
 import tempfile
 import os
+import sys
 import json
 import httpx
-from PIL import Image
-import numpy as np
+import respx
+from respx.patterns import M
 
 @pytest.fixture
 def temp_dir():
     with tempfile.TemporaryDirectory() as temp_dir:
         yield Path(temp_dir)
 
+def _clear_cached_clients():
+    """Drop the lazily built sync Groq clients so the next use re-reads GROQ_API_KEY"""
+    for name, module in list(sys.modules.items()):
+        client = getattr(module, "_client", None) if name.startswith("src.groq_") else None
+        if hasattr(client, "cache_clear"):
+            client.cache_clear()
+
 @pytest.fixture
 def mock_groq_api_key(monkeypatch):
+    # Function-scoped so the fake key never reaches the live integration tests;
+    # clients built with it are dropped on teardown for the same reason
     monkeypatch.setenv("GROQ_API_KEY", "test-api-key")
+    yield
+    _clear_cached_clients()
 
-@pytest.fixture
-def mock_httpx_client(monkeypatch):
-    """Mock httpx client for non-integration tests"""
-    class MockResponse:
-        def __init__(self, status_code=200, json_data=None, text=""):
-            self.status_code = status_code
-            self._json_data = json_data or {}
-            self._text = text
-
-        def json(self):
-            return self._json_data
-
-        @property
-        def text(self):
-            return self._text
-
-        def raise_for_status(self):
-            if self.status_code != 200:
-                raise httpx.HTTPStatusError("Error", request=None, response=self)
-
-    def mock_post(*args, **kwargs):
-        # Mock STT response
-        if "audio/transcriptions" in args[0]:
-            return MockResponse(
-                json_data={
-                    "text": "This is a mock transcription."
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+def _is_vision_request(payload):
+    """Whether any message carries an image_url content part"""
+    return any(
+        part.get("type") == "image_url"
+        for msg in payload.get("messages", [])
+        if isinstance(msg.get("content"), list)
+        for part in msg["content"]
+    )
+
+def _chat_response(payload):
+    # Check if this is a vision request
+    if _is_vision_request(payload):
+        # Check if JSON response is requested
+        if payload.get("response_format", {}).get("type") == "json_object":
+            # JSON mode returns the object as a JSON string, like the real API
+            content = json.dumps({
+                "description": "The image depicts a red square against a black background. The red square is centered in the image and is a solid, bright red color.",
+                "colors": {
+                    "background": "black",
+                    "shape": "red"
+                },
+                "composition": {
+                    "shape": "square",
+                    "position": "centered"
                 }
-            )
+            })
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+        # Regular vision response
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{
+                    "message": {
+                        "content": "The image depicts a red square against a black background. The red square is centered in the image and is a solid, bright red color. It has no other features or details. The background of the image is a solid black color, providing a stark contrast to the red square."
+                    }
+                }]
+            }
+        )
+    # Regular chat completion
+    return httpx.Response(
+        200,
+        json={
+            "id": "mock-completion-id",
+            "object": "chat.completion",
+            "created": 1234567890,
+            "model": payload.get("model", "default-model"),
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": "This is a test response"
+                },
+                "finish_reason": "stop"
+            }]
+        }
+    )
+
+@pytest.fixture(autouse=True)
+def mock_groq_http(request):
+    """
+    Intercept Groq API calls at the httpx transport layer with respx.
+
+    Applies to every test except those marked integration. The real clients
+    and connection pools are exercised; only the network is replaced.
+    Requests to other hosts pass through untouched, while unmocked Groq
+    endpoints fail instead of reaching the network, so tests can add their
+    own Groq routes through this fixture. Tests marked offline
+    get no routes and fail if they send any request at all.
+    """
+    if request.node.get_closest_marker("integration"):
+        yield None
+        return
+
+    if request.node.get_closest_marker("offline"):
+        # Input validation must fail before any request is sent, so skip the
+        # Groq routes and just check that nothing reached the transport
+        with respx.mock(assert_all_called=False) as router:
+            router.route().respond(400)
+            yield router
+            assert not router.calls, "Expected validation to fail before any HTTP request"
+        return
+
+    with respx.mock(assert_all_called=False) as router:
+        # Mock STT response
+        router.post(f"{GROQ_BASE_URL}/audio/transcriptions").respond(json={"text": "This is a mock transcription."})
         # Mock translation response
-        elif "audio/translations" in args[0]:
-            return MockResponse(
-                json_data={"text": "This is a test translation"},
-                text="This is a test translation"
-            )
+        router.post(f"{GROQ_BASE_URL}/audio/translations").respond(json={"text": "This is a test translation"})
+        # Mock TTS response
+        router.post(f"{GROQ_BASE_URL}/audio/speech").respond(
+            content=_WAV_AUDIO, headers={"Content-Type": "audio/wav"}
+        )
         # Mock chat completion response (including vision)
-        elif "chat/completions" in args[0]:
-            # Check if this is a vision request
-            if any(msg.get("content", [{}])[0].get("type") == "image_url" 
-                  for msg in kwargs.get("json", {}).get("messages", [])):
-                # Check if JSON response is requested
-                if kwargs.get("json", {}).get("response_format", {}).get("type") == "json_object":
-                    return MockResponse(
-                        json_data={
-                            "choices": [{
-                                "message": {
-                                    "content": {
-                                        "description": "The image depicts a red square against a black background. The red square is centered in the image and is a solid, bright red color.",
-                                        "colors": {
-                                            "background": "black",
-                                            "shape": "red"
-                                        },
-                                        "composition": {
-                                            "shape": "square",
-                                            "position": "centered"
-                                        }
-                                    }
-                                }
-                            }]
-                        }
-                    )
-                # Regular vision response
-                return MockResponse(
-                    json_data={
-                        "choices": [{
-                            "message": {
-                                "content": "The image depicts a red square against a black background. The red square is centered in the image and is a solid, bright red color. It has no other features or details. The background of the image is a solid black color, providing a stark contrast to the red square."
-                            }
-                        }]
-                    }
-                )
-            # Regular chat completion
-            return MockResponse(
-                json_data={
-                    "id": "mock-completion-id",
-                    "object": "chat.completion",
-                    "created": 1234567890,
-                    "model": kwargs.get("json", {}).get("model", "default-model"),
-                    "choices": [{
-                        "index": 0,
-                        "message": {
-                            "role": "assistant",
-                            "content": "This is a test response"
-                        },
-                        "finish_reason": "stop"
-                    }]
-                }
-            )
-        return MockResponse(status_code=404)
+        router.post(f"{GROQ_BASE_URL}/chat/completions").mock(
+            side_effect=lambda req: _chat_response(json.loads(req.content))
+        )
+        router.route(~M(host="api.groq.com")).pass_through()
+        yield router
 
-    monkeypatch.setattr(httpx, "post", mock_post)
+@pytest.fixture(autouse=True)
+def fake_filesystem(request, _assets_dir):
+    """
+    Give unit tests an in-memory filesystem via pyfakefs.
 
-@pytest.fixture
-def sample_audio_file(temp_dir):
+    Tool outputs are written to and read back from RAM. The session's sample
+    inputs are mapped in read-only from the real disk. Integration tests keep
+    the real filesystem so their outputs can be inspected afterwards.
+    """
+    if not request.node.get_closest_marker("unit"):
+        yield None
+        return
+
+    fs = request.getfixturevalue("fs")
+    # Loaded eagerly: pyfakefs fills lazily mapped directories on first access,
+    # which races when several worker threads open the same input at once
+    fs.add_real_directory(_assets_dir, lazy_read=False)
+    yield fs
+
+# WAV header for 1 second of 8-bit mono PCM at 44.1 kHz
+_WAV_HEADER = (
+    b'RIFF'                  # ChunkID
+    b'\x24\xA0\x00\x00'     # ChunkSize (41000 bytes)
+    b'WAVE'                  # Format
+    b'fmt '                  # Subchunk1ID
+    b'\x10\x00\x00\x00'     # Subchunk1Size (16 bytes)
+    b'\x01\x00'             # AudioFormat (1 = PCM)
+    b'\x01\x00'             # NumChannels (1 = Mono)
+    b'\x44\xAC\x00\x00'     # SampleRate (44100)
+    b'\x44\xAC\x00\x00'     # ByteRate (44100)
+    b'\x01\x00'             # BlockAlign (1)
+    b'\x08\x00'             # BitsPerSample (8)
+    b'data'                  # Subchunk2ID
+    b'\x00\xA0\x00\x00'     # Subchunk2Size (40960 bytes)
+)
+
+# 40960 bytes of silence (0x80 is the middle value in 8-bit audio)
+_WAV_SILENCE = b'\x80' * 40960
+
+_WAV_AUDIO = _WAV_HEADER + _WAV_SILENCE
+
+# 100x100 black PNG with a red 50x50 square in the middle, encoded offline
+_PNG_IMAGE = (
+    b'\x89PNG\r\n\x1a\n'  # Signature
+    b'\x00\x00\x00\x0d\x49\x48\x44\x52\x00\x00\x00\x64\x00\x00\x00\x64\x08\x02\x00\x00\x00\xff\x80\x02\x03'  # IHDR: 100x100, 8-bit RGB
+    b'\x00\x00\x00\x75\x49\x44\x41\x54\x78\xda\xed\xd0\x09\x0d\x00\x00\x08\xc4\xb0\xf3\x6f\x1a\x64\xf0'  # IDAT: zlib-compressed scanlines
+    b'\xa4\xcd\x14\x2c\x01\x00\x00\x00\x00\x00\x00\x60\x44\xad\xcc\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32'
+    b'\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc'
+    b'\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3'
+    b'\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\x2c\xb3\xcc\x32\xcb\xac\xfb\xb3\x00\x00\x00\x00\x00\x00\x00\xde'
+    b'\x6b\x3f\xbe\xba\xc4\x72\xae\xe5\xd0'
+    b'\x00\x00\x00\x00\x49\x45\x4e\x44\xae\x42\x60\x82'  # IEND
+)
+
+@pytest.fixture(scope="session")
+def _assets_dir(tmp_path_factory):
+    """Directory for read-only sample inputs shared by the whole session"""
+    return tmp_path_factory.mktemp("assets")
+
+@pytest.fixture(scope="session")
+def sample_audio_file(_assets_dir):
     """Create a valid test audio file that meets minimum length requirements"""
-    audio_file = temp_dir / "test.wav"
-    
-    # Create a WAV file with 1 second of silence (44100 samples)
-    # WAV header for PCM format
-    header = (
-        b'RIFF'                  # ChunkID
-        b'\x24\xA0\x00\x00'     # ChunkSize (41000 bytes)
-        b'WAVE'                  # Format
-        b'fmt '                  # Subchunk1ID
-        b'\x10\x00\x00\x00'     # Subchunk1Size (16 bytes)
-        b'\x01\x00'             # AudioFormat (1 = PCM)
-        b'\x01\x00'             # NumChannels (1 = Mono)
-        b'\x44\xAC\x00\x00'     # SampleRate (44100)
-        b'\x44\xAC\x00\x00'     # ByteRate (44100)
-        b'\x01\x00'             # BlockAlign (1)
-        b'\x08\x00'             # BitsPerSample (8)
-        b'data'                  # Subchunk2ID
-        b'\x00\xA0\x00\x00'     # Subchunk2Size (40960 bytes)
-    )
-    
-    # Create 1 second of silence (40960 bytes of zeros)
-    silence = b'\x80' * 40960  # Use 0x80 for middle value in 8-bit audio
-    
-    with open(audio_file, "wb") as f:
-        f.write(header + silence)
-    
+    audio_file = _assets_dir / "test.wav"
+    audio_file.write_bytes(_WAV_AUDIO)
     return audio_file
 
-@pytest.fixture
-def sample_image_file(temp_dir):
+@pytest.fixture(scope="session")
+def sample_image_file(_assets_dir):
     """Create a valid test image file"""
-    image_file = temp_dir / "test.jpg"
-    
-    # Create a simple 100x100 RGB image with a colored rectangle
-    img_array = np.zeros((100, 100, 3), dtype=np.uint8)
-    img_array[25:75, 25:75] = [255, 0, 0]  # Red rectangle
-    
-    # Convert numpy array to PIL Image and save
-    img = Image.fromarray(img_array)
-    img.save(image_file, format='JPEG')
-    
+    image_file = _assets_dir / "test.png"
+    image_file.write_bytes(_PNG_IMAGE)
     return image_file
 
 @pytest.fixture
@@ -175,4 +223,11 @@ def sample_batch_requests():
                 ]
             }
         }
-    ] 
\ No newline at end of file
+    ] 
+
+@pytest.fixture(scope="session")
+def full_docs_len():
+    """Length of the full documentation, fetched once for the session"""
+    # Imported here so running any other test file never loads the docs module
+    from src.groq_docs import get_groq_full_docs
+    return len(get_groq_full_docs().text)
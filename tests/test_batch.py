@@ -1,7 +1,22 @@
 import os
 import json
+import gzip
+import httpx
+import orjson
+import pytest
 from pathlib import Path
-from src.groq_batch import process_batch, get_batch_status, get_batch_results
+from src.groq_batch import (
+    process_batch,
+    get_batch_status,
+    get_batch_results,
+    create_batch_request,
+    iter_batch_results,
+    upload_batch_data,
+    _iter_jsonl_lines,
+)
+from src.utils import request_with_retry, retry_delay
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 
 # Example requests
 test_requests = [
@@ -31,6 +46,7 @@ test_requests = [
     }
 ]
 
+@pytest.mark.integration
 def test_array_input():
     """Test batch processing with array input"""
     print("Testing batch processing with array input...")
@@ -38,6 +54,7 @@ def test_array_input():
     print(result.text)
     return result
 
+@pytest.mark.integration
 def test_jsonl_input():
     """Test batch processing with JSONL file input"""
     # Create test JSONL file
@@ -51,6 +68,137 @@ def test_jsonl_input():
     print(result.text)
     return result
 
+@pytest.mark.unit
+def test_jsonl_lines_reencode_mutated_messages():
+    """A messages list edited between uploads must not be served from a stale encoding"""
+    messages = [{"role": "user", "content": "first"}]
+    first = b"".join(_iter_jsonl_lines([("request-1", "llama-3.1-8b-instant", messages)]))
+    messages[0]["content"] = "second"
+    second = b"".join(_iter_jsonl_lines([("request-1", "llama-3.1-8b-instant", messages)]))
+
+    assert json.loads(first)["body"]["messages"][0]["content"] == "first"
+    assert json.loads(second)["body"]["messages"][0]["content"] == "second"
+
+@pytest.mark.unit
+def test_tuple_lines_match_request_dicts():
+    """Tuple entries encode to the same bytes as the equivalent request dict, shared lists included"""
+    shared = [{"role": "system", "content": "Answer briefly."}, {"role": "user", "content": "2+2?"}]
+    lines = list(_iter_jsonl_lines([
+        ("request-1", "llama-3.1-8b-instant", shared),
+        ("request-2", "gemma2-9b-it", shared),
+        create_batch_request("request-3", "llama-3.1-8b-instant", shared),
+    ]))
+
+    assert lines == [
+        orjson.dumps(create_batch_request(custom_id, model, shared), option=orjson.OPT_APPEND_NEWLINE)
+        for custom_id, model in [
+            ("request-1", "llama-3.1-8b-instant"),
+            ("request-2", "gemma2-9b-it"),
+            ("request-3", "llama-3.1-8b-instant"),
+        ]
+    ]
+
+@pytest.mark.unit
+def test_gzip_upload(monkeypatch, mock_groq_api_key, mock_groq_http):
+    """With GROQ_BATCH_GZIP=1 the whole multipart body is sent gzip-compressed"""
+    monkeypatch.setenv("GROQ_BATCH_GZIP", "1")
+    route = mock_groq_http.post(f"{GROQ_BASE_URL}/files").respond(json={"id": "file-1"})
+    messages = [{"role": "user", "content": "What is 2+2?"}]
+
+    assert upload_batch_data([("request-1", "llama-3.1-8b-instant", messages)]) == {"id": "file-1"}
+
+    request = route.calls.last.request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert request.headers["Authorization"] == "Bearer test-api-key"
+    body = gzip.decompress(request.content)
+    assert b'name="purpose"' in body
+    assert orjson.dumps(create_batch_request("request-1", "llama-3.1-8b-instant", messages)) in body
+
+@pytest.mark.unit
+def test_retry_delay():
+    """Retry-After seconds are honored and capped; other values fall back to exponential backoff"""
+    assert 3 <= retry_delay(httpx.Response(429, headers={"Retry-After": "3"}), 0) < 3.25
+    assert 30 <= retry_delay(httpx.Response(429, headers={"Retry-After": "120"}), 0) < 30.25
+    http_date = httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})
+    assert 4 <= retry_delay(http_date, 2) < 4.25
+    assert 8 <= retry_delay(httpx.Response(500), 3) < 8.25
+
+@pytest.mark.unit
+def test_request_with_retry(monkeypatch, mock_groq_api_key, mock_groq_http):
+    """429 and 5xx responses are retried after sleeping, and the first success is returned"""
+    sleeps = []
+    monkeypatch.setattr("src.utils.time.sleep", sleeps.append)
+    route = mock_groq_http.get(f"{GROQ_BASE_URL}/batches/batch-1").mock(side_effect=[
+        httpx.Response(429, headers={"Retry-After": "1"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"id": "batch-1", "status": "completed"}),
+    ])
+
+    assert get_batch_status("batch-1") == {"id": "batch-1", "status": "completed"}
+    assert route.call_count == 3
+    assert len(sleeps) == 2 and 1 <= sleeps[0] < 1.25
+
+@pytest.mark.unit
+def test_request_with_retry_gives_up(monkeypatch, mock_groq_http):
+    """The last failed response is returned once retries run out"""
+    monkeypatch.setattr("src.utils.time.sleep", lambda _: None)
+    route = mock_groq_http.get(f"{GROQ_BASE_URL}/batches").respond(500)
+
+    with httpx.Client(base_url=GROQ_BASE_URL) as client:
+        response = request_with_retry(client, "GET", "/batches", max_retries=3)
+
+    assert response.status_code == 500
+    assert route.call_count == 3
+
+@pytest.mark.unit
+def test_iter_batch_results(mock_groq_api_key, mock_groq_http):
+    """Results are streamed one decoded record per non-empty JSONL line"""
+    mock_groq_http.get(f"{GROQ_BASE_URL}/files/file-1/content").respond(
+        content=b'{"custom_id":"request-1"}\n\n{"custom_id":"request-2"}\n'
+    )
+
+    assert list(iter_batch_results("file-1")) == [{"custom_id": "request-1"}, {"custom_id": "request-2"}]
+
+@pytest.mark.unit
+def test_get_batch_results_saves_stream(temp_dir, mock_groq_api_key, mock_groq_http):
+    """Results larger than one stream chunk are saved byte for byte"""
+    content = b"".join(b'{"custom_id":"request-%d","response":{"status_code":200}}\n' % i for i in range(10000))
+    mock_groq_http.get(f"{GROQ_BASE_URL}/files/file-1/content").respond(content=content)
+    output_path = temp_dir / "results" / "batch.jsonl"
+
+    assert get_batch_results("file-1", str(output_path)) == str(output_path)
+    assert output_path.read_bytes() == content
+
+@pytest.mark.unit
+def test_get_batch_results_error(temp_dir, mock_groq_api_key, mock_groq_http):
+    """A failed download reports the API error and saves nothing"""
+    mock_groq_http.get(f"{GROQ_BASE_URL}/files/file-1/content").respond(
+        404, json={"error": {"message": "File not found"}}
+    )
+    output_path = temp_dir / "batch.jsonl"
+
+    result = get_batch_results("file-1", str(output_path))
+
+    assert result.text == "Error retrieving batch results: Failed to get batch results: File not found"
+    assert not output_path.exists()
+
+@pytest.mark.unit
+def test_get_batch_results_unsavable_path(temp_dir, mock_groq_api_key, mock_groq_http):
+    """When the file cannot be written, the results are returned as text instead"""
+    route = mock_groq_http.get(f"{GROQ_BASE_URL}/files/file-1/content").respond(
+        content=b'{"custom_id":"request-1"}\n{"custom_id":"request-2"}\n'
+    )
+    (temp_dir / "not-a-dir").write_bytes(b"")
+    output_path = temp_dir / "not-a-dir" / "batch.jsonl"
+
+    result = get_batch_results("file-1", str(output_path))
+
+    assert result.text == (
+        f"Could not save to {output_path}, but here's the content:\n\n"
+        '{"custom_id":"request-1"}\n{"custom_id":"request-2"}'
+    )
+    assert route.call_count == 2
+
 if __name__ == "__main__":
     # Test array input
     array_result = test_array_input()
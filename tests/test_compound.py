@@ -0,0 +1,59 @@
+import pytest
+import httpx
+from src.groq_compound import compound_chat
+from src.utils import MCPError
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+@pytest.mark.parametrize("messages", [
+    [None],  # None entry
+    [{"role": "user", "content": "Hi"}, None],  # None after a valid entry
+    [{"wrong": "format"}],  # Missing role/content
+    [{"role": "user"}],  # Missing content
+], ids=["none_entry", "trailing_none", "no_role", "no_content"])
+@pytest.mark.unit
+@pytest.mark.offline
+def test_invalid_messages(temp_dir, mock_groq_api_key, messages):
+    """Malformed messages, including None entries, fail before any request is sent"""
+    with pytest.raises(MCPError, match="'role' and 'content'"):
+        compound_chat(messages=messages, stream=False, output_directory=str(temp_dir))
+
+@pytest.mark.parametrize("stream", [False, True], ids=["json", "stream"])
+@pytest.mark.unit
+def test_api_error_message(temp_dir, mock_groq_api_key, mock_groq_http, stream):
+    """The API's error message is reported on both the streaming and the non-streaming path"""
+    mock_groq_http.post(f"{GROQ_BASE_URL}/chat/completions").respond(
+        429, json={"error": {"message": "slow down"}}
+    )
+
+    with pytest.raises(MCPError, match="Groq API error: slow down"):
+        compound_chat([{"role": "user", "content": "Hi"}], stream=stream, output_directory=str(temp_dir))
+
+@pytest.mark.unit
+def test_stream_parsing(temp_dir, mock_groq_api_key, mock_groq_http, capsys):
+    """Streamed SSE lines are reassembled across chunks, CRLF and keep-alives included"""
+    chunks = [
+        # A line, and a UTF-8 character, split across two chunks
+        b'data: {"choices":[{"delta":{"content":"Caf\xc3',
+        b'\xa9"}}]}\r\n\r\n: keep-alive\r\n\r\n',
+        b'data: {"choices":[{"delta":{"executed_tools":[{"index":0,"type":"search","arguments":"{\\"q\\":\\"x\\"}"}]}}]}\r\n\r\n',
+        b'data: {"choices":[{"delta":{"executed_tools":[{"index":0,"type":"search","output":"result"}]}}]}\n\n',
+        # The last line has no trailing newline
+        b'data: {"choices":[{"delta":{"content":" au lait"}}]}\n\ndata: [DONE]',
+    ]
+    route = mock_groq_http.post(f"{GROQ_BASE_URL}/chat/completions").mock(
+        side_effect=lambda request: httpx.Response(
+            200, content=iter(chunks), headers={"Content-Type": "text/event-stream"}
+        )
+    )
+
+    result = compound_chat([{"role": "user", "content": "Hi"}], stream=True, save_to_file=False)
+
+    assert route.calls.last.request.headers["Accept"] == "text/event-stream"
+    assert result.text == (
+        "Café au lait\n\nExecuted Tools:\n"
+        '\n- Tool 0: search\n  Arguments: {"q":"x"}\n  Output: result'
+    )
+    out = capsys.readouterr().out
+    assert out.index("Café") < out.index('Executing tool: search with args: {"q":"x"}')
+    assert out.index("Tool output received: result") < out.index(" au lait")
@@ -1,18 +1,25 @@
 import pytest
-from src.groq_docs import get_groq_full_docs, get_groq_short_docs
+from src.groq_docs import get_groq_full_docs, get_groq_short_docs, extract_section
 
-def test_get_full_docs(mock_groq_api_key):
+def test_get_full_docs():
     """Test getting full Groq documentation"""
     result = get_groq_full_docs()
     assert result.type == "text"
     assert len(result.text) > 0
     assert "Groq" in result.text
 
-def test_get_short_docs(mock_groq_api_key):
+def test_get_short_docs(full_docs_len):
     """Test getting short Groq documentation"""
     result = get_groq_short_docs()
     assert result.type == "text"
     assert len(result.text) > 0
     assert "Groq" in result.text
     # Short docs should be shorter than full docs
-    assert len(result.text) < len(get_groq_full_docs().text) 
\ No newline at end of file
+    assert len(result.text) < full_docs_len
+
+def test_extract_section():
+    """Test returning a single section of the documentation"""
+    docs = "# Intro\ntext\n## Rate Limits\nlimits\n```python\n# comment\n```\n## Models\nmodels\n"
+    assert extract_section(docs, "rate limits") == "## Rate Limits\nlimits\n```python\n# comment\n```\n"
+    assert extract_section(docs, "models") == "## Models\nmodels\n"
+    assert extract_section(docs, "missing") is None
@@ -0,0 +1,41 @@
+import os
+import stat
+import pytest
+from src.pretty import main
+
+@pytest.fixture
+def compact_json(temp_dir):
+    path = temp_dir / "groq-chat-full_test.json"
+    path.write_bytes(b'{"id":"mock","choices":[{"index":0}]}')
+    return path
+
+_PRETTY = b'{\n  "id": "mock",\n  "choices": [\n    {\n      "index": 0\n    }\n  ]\n}\n'
+
+@pytest.mark.unit
+def test_prints_indented_json(compact_json, capsysbinary):
+    """Files are printed indented and left unchanged on disk"""
+    assert main([str(compact_json)]) == 0
+    assert capsysbinary.readouterr().out == _PRETTY
+    assert compact_json.read_bytes() == b'{"id":"mock","choices":[{"index":0}]}'
+
+@pytest.mark.unit
+def test_in_place(compact_json, capsysbinary):
+    """--in-place rewrites the file, keeping its mode, and prints nothing"""
+    compact_json.chmod(0o640)
+
+    assert main(["--in-place", str(compact_json)]) == 0
+    assert capsysbinary.readouterr().out == b""
+    assert compact_json.read_bytes() == _PRETTY
+    assert stat.S_IMODE(os.stat(compact_json).st_mode) == 0o640
+
+@pytest.mark.unit
+def test_invalid_json(temp_dir, compact_json, capsysbinary):
+    """Unreadable files are reported on stderr and fail the run, but the other files are still printed"""
+    broken = temp_dir / "broken.json"
+    broken.write_bytes(b'{"id":')
+
+    assert main([str(broken), str(compact_json), str(temp_dir / "missing.json")]) == 1
+    captured = capsysbinary.readouterr()
+    assert captured.out == _PRETTY
+    assert str(broken).encode() in captured.err
+    assert b"missing.json" in captured.err
@@ -7,8 +7,12 @@ from src.groq_stt import (
 )
 from src.utils import MCPError
 
+@pytest.fixture(scope="session")
+def stt_models():
+    return list_stt_models()
+
 @pytest.mark.unit
-def test_transcribe_audio(temp_dir, mock_groq_api_key, mock_httpx_client, sample_audio_file):
+def test_transcribe_audio(temp_dir, mock_groq_api_key, sample_audio_file):
     """Test audio transcription"""
     result = transcribe_audio(
         input_file_path=str(sample_audio_file),
@@ -20,7 +24,7 @@ def test_transcribe_audio(temp_dir, mock_groq_api_key, mock_httpx_client, sample
     assert len(result.text) > 0
 
 @pytest.mark.unit
-def test_translate_audio(temp_dir, mock_groq_api_key, mock_httpx_client, sample_audio_file):
+def test_translate_audio(temp_dir, mock_groq_api_key, sample_audio_file):
     """Test audio translation"""
     result = translate_audio(
         input_file_path=str(sample_audio_file),
@@ -32,15 +36,16 @@ def test_translate_audio(temp_dir, mock_groq_api_key, mock_httpx_client, sample_
     assert len(result.text) > 0
 
 @pytest.mark.unit
-def test_list_stt_models(mock_groq_api_key):
+def test_list_stt_models(stt_models):
     """Test listing available STT models"""
-    result = list_stt_models()
+    result = stt_models
     assert result.type == "text"
     assert "whisper-large-v3" in result.text
     assert "whisper-large-v3-turbo" in result.text
 
 @pytest.mark.unit
-def test_invalid_audio_file(temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.offline
+def test_invalid_audio_file(temp_dir, mock_groq_api_key):
     """Test that invalid audio file raises error"""
     with pytest.raises(MCPError):
         transcribe_audio(
@@ -49,12 +54,13 @@ def test_invalid_audio_file(temp_dir, mock_groq_api_key, mock_httpx_client):
         )
 
 @pytest.mark.unit
+@pytest.mark.offline
 @pytest.mark.parametrize("invalid_model", [
     "invalid-model",
     "whisper-invalid",
     "gpt-4"  # Valid Groq model but not for STT
 ])
-def test_invalid_model(temp_dir, mock_groq_api_key, mock_httpx_client, sample_audio_file, invalid_model):
+def test_invalid_model(temp_dir, mock_groq_api_key, sample_audio_file, invalid_model):
     """Test that invalid model raises error"""
     with pytest.raises(MCPError):
         transcribe_audio(
@@ -65,7 +71,7 @@ def test_invalid_model(temp_dir, mock_groq_api_key, mock_httpx_client, sample_au
 
 # Add integration tests that use real API
 @pytest.mark.integration
-def test_transcribe_audio_integration(temp_dir, mock_groq_api_key, sample_audio_file):
+def test_transcribe_audio_integration(temp_dir, sample_audio_file):
     """Integration test for audio transcription"""
     result = transcribe_audio(
         input_file_path=str(sample_audio_file),
@@ -77,7 +83,7 @@ def test_transcribe_audio_integration(temp_dir, mock_groq_api_key, sample_audio_
     assert len(result.text) > 0
 
 @pytest.mark.integration
-def test_translate_audio_integration(temp_dir, mock_groq_api_key, sample_audio_file):
+def test_translate_audio_integration(temp_dir, sample_audio_file):
     """Integration test for audio translation"""
     result = translate_audio(
         input_file_path=str(sample_audio_file),
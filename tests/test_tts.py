@@ -1,10 +1,26 @@
 import pytest
-from pathlib import Path
 from src.groq_tts import text_to_speech, list_voices
 from src.utils import MCPError
+from _helpers import extract_path
+
+# One character past text_to_speech's 10,000 character limit
+_OVERSIZE = "a" * 10001
+
+# list_voices only formats static catalogs, so each listing is built once per session
+@pytest.fixture(scope="session")
+def voices_all():
+    return list_voices("all")
+
+@pytest.fixture(scope="session")
+def voices_en():
+    return list_voices("playai-tts")
+
+@pytest.fixture(scope="session")
+def voices_ar():
+    return list_voices("playai-tts-arabic")
 
 @pytest.mark.unit
-def test_text_to_speech(temp_dir, mock_groq_api_key, mock_httpx_client):
+def test_text_to_speech(temp_dir, mock_groq_api_key):
     """Test text to speech conversion"""
     text = "Hello, this is a test."
     result = text_to_speech(
@@ -20,15 +36,14 @@ def test_text_to_speech(temp_dir, mock_groq_api_key, mock_httpx_client):
     assert "Voice used: Arista-PlayAI" in result.text
     
     # Extract file path from response
-    file_path = result.text.split("File saved as: ")[1].split(".")[0] + ".wav"
-    output_file = Path(file_path)
+    output_file = extract_path(result.text)
     assert output_file.exists()
     assert output_file.suffix == ".wav"
 
 @pytest.mark.unit
-def test_list_voices(mock_groq_api_key):
+def test_list_voices(voices_all):
     """Test listing available voices"""
-    result = list_voices("all")
+    result = voices_all
     
     # Check that the result is a TextContent object
     assert result.type == "text"
@@ -36,9 +51,9 @@ def test_list_voices(mock_groq_api_key):
     assert "Arista-PlayAI" in result.text  # Check for a known voice
 
 @pytest.mark.unit
-def test_list_voices_english(mock_groq_api_key):
+def test_list_voices_english(voices_en):
     """Test listing English voices"""
-    result = list_voices("playai-tts")
+    result = voices_en
     
     # Check that the result is a TextContent object
     assert result.type == "text"
@@ -47,9 +62,9 @@ def test_list_voices_english(mock_groq_api_key):
     assert "Ahmad-PlayAI" not in result.text  # Should not include Arabic voices
 
 @pytest.mark.unit
-def test_list_voices_arabic(mock_groq_api_key):
+def test_list_voices_arabic(voices_ar):
     """Test listing Arabic voices"""
-    result = list_voices("playai-tts-arabic")
+    result = voices_ar
     
     # Check that the result is a TextContent object
     assert result.type == "text"
@@ -59,10 +74,11 @@ def test_list_voices_arabic(mock_groq_api_key):
 
 @pytest.mark.parametrize("invalid_text", [
     "",  # Empty string
-    "a" * 10001,  # Too long (over 10,000 characters)
+    _OVERSIZE,  # Too long (over 10,000 characters)
 ])
 @pytest.mark.unit
-def test_text_to_speech_invalid_input(invalid_text, temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.offline
+def test_text_to_speech_invalid_input(invalid_text, temp_dir, mock_groq_api_key):
     """Test text to speech with invalid input"""
     with pytest.raises(MCPError):
         text_to_speech(
@@ -1,8 +1,18 @@
 import pytest
-from pathlib import Path
 import json
-from src.groq_ttt import chat_completion, list_chat_models
+import asyncio
+import httpx
+from mcp.types import TextContent
+import src.groq_ttt
+from src.groq_ttt import chat_completion, chat_completion_batch, chat_completion_sync, chat_completion_stream, list_chat_models
 from src.utils import MCPError
+from _helpers import load_json, read_output
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+@pytest.fixture(scope="session")
+def chat_models():
+    return list_chat_models()
 
 @pytest.fixture
 def sample_messages():
@@ -12,16 +22,18 @@ def sample_messages():
     ]
 
 @pytest.mark.unit
-def test_chat_completion(temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.asyncio
+async def test_chat_completion(temp_dir, mock_groq_api_key):
     """Test basic chat completion functionality"""
     messages = [
         {"role": "user", "content": "Hello"}
     ]
     
-    result = chat_completion(
+    result = await chat_completion(
         messages=messages,
         model="gemma2-9b-it",
-        output_directory=str(temp_dir)
+        output_directory=str(temp_dir),
+        save_full_response=True
     )
     
     # Test response structure only
@@ -31,32 +43,46 @@ def test_chat_completion(temp_dir, mock_groq_api_key, mock_httpx_client):
     assert "Model used:" in result.text
     
     # Get the base filename from the text file path
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
+    output_file, _ = read_output(result.text)
     
     # Check the corresponding JSON file - the pattern is groq-chat-full_{first_few_words}_{timestamp}.json
     json_file = output_file.parent / f"groq-chat-full_{output_file.stem.split('_', 1)[1]}.json"
-    assert json_file.exists()
-    with open(json_file) as f:
-        content = json.load(f)
-        assert isinstance(content, dict)
-        assert "choices" in content
-        assert isinstance(content["choices"], list)
-        assert len(content["choices"]) > 0
-        assert "message" in content["choices"][0]
-        assert "content" in content["choices"][0]["message"]
-        assert isinstance(content["choices"][0]["message"]["content"], str)
-        assert len(content["choices"][0]["message"]["content"]) > 0
+    content = load_json(json_file)
+    assert isinstance(content, dict)
+    assert "choices" in content
+    assert isinstance(content["choices"], list)
+    assert len(content["choices"]) > 0
+    assert "message" in content["choices"][0]
+    assert "content" in content["choices"][0]["message"]
+    assert isinstance(content["choices"][0]["message"]["content"], str)
+    assert len(content["choices"][0]["message"]["content"]) > 0
 
 @pytest.mark.unit
-def test_chat_completion_with_system(temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.asyncio
+async def test_chat_completion_path_with_spaces(temp_dir, mock_groq_api_key):
+    """Test that a saved path containing spaces is reported and read back whole"""
+    output_directory = temp_dir / "My Desktop"
+
+    result = await chat_completion(
+        messages=[{"role": "user", "content": "Hello"}],
+        model="gemma2-9b-it",
+        output_directory=str(output_directory)
+    )
+
+    output_file, text = read_output(result.text)
+    assert output_file.parent == output_directory
+    assert text == "This is a test response"
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_chat_completion_with_system(temp_dir, mock_groq_api_key):
     """Test chat completion with system message"""
     messages = [
         {"role": "system", "content": "You are a helpful assistant"},
         {"role": "user", "content": "Hi"}
     ]
     
-    result = chat_completion(
+    result = await chat_completion(
         messages=messages,
         model="gemma2-9b-it",
         output_directory=str(temp_dir)
@@ -64,49 +90,154 @@ def test_chat_completion_with_system(temp_dir, mock_groq_api_key, mock_httpx_cli
     
     assert result.type == "text"
     assert "Success" in result.text
+    # The full JSON response is only saved on request
+    assert not list(temp_dir.glob("groq-chat-full_*"))
 
+@pytest.mark.parametrize("messages", [
+    [],  # Empty messages
+    [{"wrong": "format"}],  # Missing role/content
+    [{"role": "user"}],  # Missing content
+    None,  # None value
+], ids=["empty", "no_role", "no_content", "none"])
 @pytest.mark.unit
-def test_invalid_messages(temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.offline
+@pytest.mark.asyncio
+async def test_invalid_messages(temp_dir, mock_groq_api_key, messages):
     """Test various invalid message formats"""
-    invalid_messages = [
-        [],  # Empty messages
-        [{"wrong": "format"}],  # Missing role/content
-        [{"role": "invalid", "content": "test"}],  # Invalid role
-        [{"role": "user"}],  # Missing content
-        None,  # None value
-    ]
-    
-    for messages in invalid_messages:
-        with pytest.raises(MCPError):
-            chat_completion(
-                messages=messages,
-                model="gemma2-9b-it",
-                output_directory=str(temp_dir)
-            )
-
-@pytest.mark.unit
-def test_invalid_temperature(temp_dir, mock_groq_api_key, mock_httpx_client):
-    """Test invalid temperature values"""
-    messages = [{"role": "user", "content": "test"}]
-    
     with pytest.raises(MCPError):
-        chat_completion(
+        await chat_completion(
             messages=messages,
-            temperature=-1,
+            model="gemma2-9b-it",
             output_directory=str(temp_dir)
         )
-    
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_invalid_role_rejected_by_api(temp_dir, mock_groq_api_key, mock_groq_http):
+    """Roles are left for the API to check, and its rejection surfaces as an MCPError"""
+    route = mock_groq_http.post(f"{GROQ_BASE_URL}/chat/completions").respond(
+        400, json={"error": {"message": "'messages.0.role' must be one of system, user, assistant, tool"}}
+    )
+    with pytest.raises(MCPError, match="must be one of"):
+        await chat_completion(
+            messages=[{"role": "invalid", "content": "test"}],
+            model="gemma2-9b-it",
+            output_directory=str(temp_dir)
+        )
+    assert route.called
+
+@pytest.mark.parametrize("temperature", [-1, 2.1])
+@pytest.mark.unit
+@pytest.mark.offline
+@pytest.mark.asyncio
+async def test_invalid_temperature(temp_dir, mock_groq_api_key, temperature):
+    """Test invalid temperature values"""
     with pytest.raises(MCPError):
-        chat_completion(
-            messages=messages,
-            temperature=2.1,
+        await chat_completion(
+            messages=[{"role": "user", "content": "test"}],
+            temperature=temperature,
             output_directory=str(temp_dir)
         )
 
 @pytest.mark.unit
-def test_list_chat_models(mock_groq_api_key, mock_httpx_client):
+@pytest.mark.asyncio
+async def test_chat_completion_retries_rate_limit(monkeypatch, mock_groq_api_key, mock_groq_http):
+    """Test that a 429 is retried after the Retry-After delay instead of failing the call"""
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr("src.utils.asyncio.sleep", fake_sleep)
+    route = mock_groq_http.post(f"{GROQ_BASE_URL}/chat/completions").mock(side_effect=[
+        httpx.Response(429, headers={"Retry-After": "2"}, json={"error": {"message": "slow down"}}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "Recovered"}}]}),
+    ])
+
+    result = await chat_completion([{"role": "user", "content": "Hi"}], save_to_file=False)
+
+    assert result.text == "Recovered"
+    assert route.call_count == 2
+    assert len(sleeps) == 1 and 2 <= sleeps[0] < 2.25
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_chat_completion_stream(mock_groq_api_key, mock_groq_http):
+    """Test that streamed content deltas are yielded as they arrive"""
+    sse = (
+        b'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+        b'data: {"choices":[{"delta":{"content":"Hello"}}]}\n\n'
+        b': keep-alive\n\n'
+        b'data: {"choices":[{"delta":{"content":" there"}}]}\n\n'
+        b'data: [DONE]\n\n'
+    )
+    route = mock_groq_http.post(f"{GROQ_BASE_URL}/chat/completions").respond(
+        content=sse, headers={"Content-Type": "text/event-stream"}
+    )
+
+    chunks = [chunk async for chunk in chat_completion_stream([{"role": "user", "content": "Hi"}], model="gemma2-9b-it")]
+    assert chunks == ["Hello", " there"]
+    assert json.loads(route.calls.last.request.content)["stream"] is True
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_chat_completion_batch(monkeypatch):
+    """Test that batched completions keep input order, cap concurrency and capture failures"""
+    in_flight = 0
+    peak = 0
+
+    async def fake_chat_completion(messages, save_to_file=True, **kwargs):
+        nonlocal in_flight, peak
+        assert save_to_file is False
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if messages[0]["content"] == "fail":
+            raise MCPError("Groq API error: rate limited")
+        return TextContent(type="text", text=messages[0]["content"])
+
+    monkeypatch.setattr(src.groq_ttt, "chat_completion", fake_chat_completion)
+    prompts = ["a", "fail", "b", "c", "d"]
+    results = await chat_completion_batch(
+        [[{"role": "user", "content": p}] for p in prompts],
+        concurrency=2,
+        save_to_file=True,
+    )
+
+    assert peak == 2
+    assert isinstance(results[1], MCPError)
+    assert [r.text for i, r in enumerate(results) if i != 1] == ["a", "b", "c", "d"]
+
+@pytest.mark.unit
+def test_async_client_per_event_loop(mock_groq_api_key):
+    """Test that each event loop gets its own client, so asyncio.run can be called repeatedly"""
+    async def use_client():
+        client = src.groq_ttt._async_client()
+        assert client is src.groq_ttt._async_client()
+        await src.groq_ttt.aclose_client()
+        assert client.is_closed
+        return client
+
+    assert asyncio.run(use_client()) is not asyncio.run(use_client())
+
+@pytest.mark.unit
+def test_chat_completion_sync(temp_dir, mock_groq_api_key):
+    """Test the blocking wrapper works repeatedly and from inside a running loop"""
+    messages = [{"role": "user", "content": "Hello"}]
+    for _ in range(2):
+        result = chat_completion_sync(messages=messages, save_to_file=False)
+        assert result.text == "This is a test response"
+
+    async def from_running_loop():
+        return chat_completion_sync(messages=messages, save_to_file=False)
+
+    assert asyncio.run(from_running_loop()).text == "This is a test response"
+
+@pytest.mark.unit
+def test_list_chat_models(chat_models):
     """Test listing available chat models"""
-    result = list_chat_models()
+    result = chat_models
     
     assert result.type == "text"
     assert "Available Groq Chat Models" in result.text
@@ -118,17 +249,19 @@ def test_list_chat_models(mock_groq_api_key, mock_httpx_client):
     ])
 
 @pytest.mark.integration
-def test_chat_completion_integration(temp_dir, mock_groq_api_key):
+@pytest.mark.asyncio
+async def test_chat_completion_integration(temp_dir):
     """Integration test for chat completion"""
     messages = [
         {"role": "user", "content": "Write a one-word greeting"}
     ]
     
-    result = chat_completion(
+    result = await chat_completion(
         messages=messages,
         model="gemma2-9b-it",
         temperature=0,  # Use 0 for more consistent results
-        output_directory=str(temp_dir)
+        output_directory=str(temp_dir),
+        save_full_response=True
     )
     
     # Only test structural aspects
@@ -137,15 +270,12 @@ def test_chat_completion_integration(temp_dir, mock_groq_api_key):
     assert "saved as:" in result.text
     
     # Get the base filename from the text file path
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
+    output_file, _ = read_output(result.text)
     
     # Check the corresponding JSON file - the pattern is groq-chat-full_{first_few_words}_{timestamp}.json
     json_file = output_file.parent / f"groq-chat-full_{output_file.stem.split('_', 1)[1]}.json"
-    assert json_file.exists()
-    with open(json_file) as f:
-        content = json.load(f)
-        assert isinstance(content, dict)
-        assert "choices" in content
-        assert len(content["choices"]) > 0
-        assert isinstance(content["choices"][0]["message"]["content"], str) 
\ No newline at end of file
+    content = load_json(json_file)
+    assert isinstance(content, dict)
+    assert "choices" in content
+    assert len(content["choices"]) > 0
+    assert isinstance(content["choices"][0]["message"]["content"], str) 
\ No newline at end of file
@@ -0,0 +1,57 @@
+import os
+import stat
+import pytest
+from src.utils import open_atomic, write_file_atomic
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+@pytest.mark.unit
+def test_write_file_atomic_uses_default_mode(temp_dir):
+    """New files get the same permissions a plain open() would give them"""
+    plain = temp_dir / "plain.txt"
+    plain.write_bytes(b"plain")
+    atomic = temp_dir / "atomic.txt"
+
+    write_file_atomic(atomic, "atomic")
+
+    assert atomic.read_text() == "atomic"
+    assert _mode(atomic) == _mode(plain)
+
+@pytest.mark.unit
+def test_write_file_atomic_keeps_existing_mode(temp_dir):
+    """Replacing a file keeps its permissions"""
+    path = temp_dir / "out.json"
+    path.write_bytes(b"{}")
+    path.chmod(0o640)
+
+    write_file_atomic(path, b'{"a": 1}')
+
+    assert path.read_bytes() == b'{"a": 1}'
+    assert _mode(path) == 0o640
+
+@pytest.mark.unit
+def test_open_atomic_crash_keeps_old_contents(temp_dir):
+    """A write that fails part way leaves the previous file untouched and no temporary file behind"""
+    path = temp_dir / "out.txt"
+    path.write_bytes(b"old contents")
+
+    with pytest.raises(RuntimeError):
+        with open_atomic(path) as f:
+            f.write(b"new")
+            raise RuntimeError("crashed mid-write")
+
+    assert path.read_bytes() == b"old contents"
+    assert list(temp_dir.iterdir()) == [path]
+
+@pytest.mark.unit
+def test_open_atomic_crash_creates_nothing(temp_dir):
+    """A failed first write never leaves a truncated file at the target path"""
+    path = temp_dir / "new.txt"
+
+    with pytest.raises(RuntimeError):
+        with open_atomic(path) as f:
+            f.write(b"partial")
+            raise RuntimeError("crashed mid-write")
+
+    assert not list(temp_dir.iterdir())
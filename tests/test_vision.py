@@ -1,14 +1,45 @@
 import pytest
-from pathlib import Path
-import json
-from src.groq_vision import analyze_image, analyze_image_json
+import pytest_asyncio
+import httpx
+import re
+from collections import deque
+from src.groq_vision import analyze_image, analyze_image_json, analyze_images_batch
 from src.utils import MCPError
+from _helpers import extract_path, load_json, read_output
+
+# Colors, shapes and positions the test image should be described with
+_DESCRIPTION_TERMS = re.compile(r"red|black|square|rectangle|center|middle|position", re.I)
+
+# Vocabulary the live-model checks look for, matched case-insensitively in one pass
+_DESCRIPTIVE = re.compile(
+    r"colou?r(?:ed)?|dark|light|bright|shade|shape|geometric|form|figure|position|located|placed"
+    r"|composition|background|foreground|appears|contains|shows|depicts|image|picture",
+    re.I,
+)
+_VISUAL = re.compile(r"colou?r|shape|size|position|background|appears|looks", re.I)
+_BASIC = re.compile(r"\b(?:the|is|are|in|on|with|and)\b", re.I)
+_COLORS = re.compile(r"red|black|white|blue|green", re.I)
+_LAYOUT = re.compile(r"position|layout|arranged|placed", re.I)
+
+def check_content(content):
+    """Walk parsed JSON and return True as soon as any string describes the test image"""
+    stack = deque([content])
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+        elif isinstance(obj, str) and _DESCRIPTION_TERMS.search(obj):
+            return True
+    return False
 
 @pytest.mark.unit
-def test_analyze_image(temp_dir, mock_groq_api_key, mock_httpx_client, sample_image_file):
+@pytest.mark.asyncio
+async def test_analyze_image(temp_dir, mock_groq_api_key, sample_image_file):
     """Test basic image analysis"""
-    result = analyze_image(
-        input_file_path=str(sample_image_file),
+    result = await analyze_image(
+        input_source=str(sample_image_file),
         prompt="What's in this image?",
         output_directory=str(temp_dir)
     )
@@ -20,10 +51,7 @@ def test_analyze_image(temp_dir, mock_groq_api_key, mock_httpx_client, sample_im
     assert "Model used:" in result.text
     
     # Extract and read the output file
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
-    with open(output_file) as f:
-        content = f.read()
+    _, content = read_output(result.text)
     
     # Test content without being too rigid
     assert any(color in content.lower() for color in ["red", "black"])
@@ -31,10 +59,11 @@ def test_analyze_image(temp_dir, mock_groq_api_key, mock_httpx_client, sample_im
     assert any(pos in content.lower() for pos in ["center", "middle", "position"])
 
 @pytest.mark.unit
-def test_analyze_image_json(temp_dir, mock_groq_api_key, mock_httpx_client, sample_image_file):
+@pytest.mark.asyncio
+async def test_analyze_image_json(temp_dir, mock_groq_api_key, sample_image_file):
     """Test JSON-formatted image analysis"""
-    result = analyze_image_json(
-        input_file_path=str(sample_image_file),
+    result = await analyze_image_json(
+        input_source=str(sample_image_file),
         prompt="Extract key information from this image as JSON",
         output_directory=str(temp_dir)
     )
@@ -46,65 +75,55 @@ def test_analyze_image_json(temp_dir, mock_groq_api_key, mock_httpx_client, samp
     assert "Model used:" in result.text
     
     # Extract and read the output file
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
-    with open(output_file) as f:
-        content = json.load(f)
+    content = load_json(extract_path(result.text))
     
     # Test JSON structure without being too rigid
     assert isinstance(content, (dict, list))
     
-    # Helper function to check content recursively
-    def check_content(obj):
-        if isinstance(obj, dict):
-            return any(check_content(v) for v in obj.values())
-        elif isinstance(obj, list):
-            return any(check_content(item) for item in obj)
-        elif isinstance(obj, str):
-            return (
-                any(color in obj.lower() for color in ["red", "black"]) or
-                any(shape in obj.lower() for shape in ["square", "rectangle"]) or
-                any(pos in obj.lower() for pos in ["center", "middle", "position"])
-            )
-        return False
-    
     assert check_content(content), "JSON response should contain image description elements"
 
 @pytest.mark.unit
-def test_invalid_image_file(temp_dir, mock_groq_api_key, mock_httpx_client):
+@pytest.mark.offline
+@pytest.mark.asyncio
+async def test_invalid_image_file(temp_dir, mock_groq_api_key):
     """Test that invalid image file raises error"""
     with pytest.raises(MCPError):
-        analyze_image(
-            input_file_path="nonexistent.jpg",
+        await analyze_image(
+            input_source="nonexistent.jpg",
             output_directory=str(temp_dir)
         )
 
 @pytest.mark.unit
-def test_invalid_prompt(temp_dir, mock_groq_api_key, mock_httpx_client, sample_image_file):
+@pytest.mark.offline
+@pytest.mark.asyncio
+async def test_invalid_prompt(temp_dir, mock_groq_api_key, sample_image_file):
     """Test that empty prompt raises error"""
     with pytest.raises(MCPError, match="Prompt is required"):
-        analyze_image(
-            input_file_path=str(sample_image_file),
+        await analyze_image(
+            input_source=str(sample_image_file),
             prompt="",
             output_directory=str(temp_dir)
         )
 
 @pytest.mark.parametrize("temperature", [-1.0, 2.1])
 @pytest.mark.unit
-def test_invalid_temperature(temp_dir, mock_groq_api_key, mock_httpx_client, sample_image_file, temperature):
+@pytest.mark.offline
+@pytest.mark.asyncio
+async def test_invalid_temperature(temp_dir, mock_groq_api_key, sample_image_file, temperature):
     """Test that invalid temperature raises error"""
     with pytest.raises(MCPError):
-        analyze_image(
-            input_file_path=str(sample_image_file),
+        await analyze_image(
+            input_source=str(sample_image_file),
             temperature=temperature,
             output_directory=str(temp_dir)
         )
 
 @pytest.mark.integration
-def test_analyze_image_integration(temp_dir, mock_groq_api_key, sample_image_file):
+@pytest.mark.asyncio
+async def test_analyze_image_integration(temp_dir, sample_image_file):
     """Integration test for image analysis"""
-    result = analyze_image(
-        input_file_path=str(sample_image_file),
+    result = await analyze_image(
+        input_source=str(sample_image_file),
         prompt="Please describe this image, including its colors, shapes, and composition.",  # More specific prompt
         output_directory=str(temp_dir)
     )
@@ -116,39 +135,25 @@ def test_analyze_image_integration(temp_dir, mock_groq_api_key, sample_image_fil
     assert "Model used:" in result.text
     
     # Extract and read the output file
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
-    with open(output_file) as f:
-        content = f.read().lower()  # Convert to lowercase once
+    _, content = read_output(result.text)
     
     # Test content with more flexible criteria
     # 1. Check if response is substantial
     assert len(content) > 50, "Response is too short"
     
-    # 2. Check if it contains descriptive language
-    descriptive_terms = [
-        # Colors (more general)
-        "color", "colored", "dark", "light", "bright", "shade",
-        # Shapes (more general)
-        "shape", "geometric", "form", "figure",
-        # Position/Composition (more general)
-        "position", "located", "placed", "composition", "background", "foreground",
-        # Common descriptive words
-        "appears", "contains", "shows", "depicts", "image", "picture"
-    ]
-    
-    matches = [term for term in descriptive_terms if term in content]
-    assert len(matches) >= 3, f"Response lacks descriptive terms. Found only: {matches}"
+    # 2. Check if it contains at least three distinct descriptive terms
+    matches = {term.lower() for term in _DESCRIPTIVE.findall(content)}
+    assert len(matches) >= 3, f"Response lacks descriptive terms. Found only: {sorted(matches)}"
     
     # 3. Check for basic English structure
-    basic_words = ["the", "is", "are", "in", "on", "with", "and"]
-    assert any(word in content for word in basic_words), "Response may not be well-formed English"
+    assert _BASIC.search(content), "Response may not be well-formed English"
 
 @pytest.mark.integration
-def test_analyze_image_json_integration(temp_dir, mock_groq_api_key, sample_image_file):
+@pytest.mark.asyncio
+async def test_analyze_image_json_integration(temp_dir, sample_image_file):
     """Integration test for JSON-formatted image analysis"""
-    result = analyze_image_json(
-        input_file_path=str(sample_image_file),
+    result = await analyze_image_json(
+        input_source=str(sample_image_file),
         prompt="Extract key information from this image as JSON",
         output_directory=str(temp_dir)
     )
@@ -160,67 +165,50 @@ def test_analyze_image_json_integration(temp_dir, mock_groq_api_key, sample_imag
     assert "Model used:" in result.text
     
     # Extract and read the output file
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    assert output_file.exists()
-    with open(output_file) as f:
-        content = json.load(f)
+    content = load_json(extract_path(result.text))
     
     # Test JSON structure without being too rigid
     assert isinstance(content, (dict, list))
     
-    # Use the same helper function from unit test
-    def check_content(obj):
-        if isinstance(obj, dict):
-            return any(check_content(v) for v in obj.values())
-        elif isinstance(obj, list):
-            return any(check_content(item) for item in obj)
-        elif isinstance(obj, str):
-            return (
-                any(color in obj.lower() for color in ["red", "black"]) or
-                any(shape in obj.lower() for shape in ["square", "rectangle"]) or
-                any(pos in obj.lower() for pos in ["center", "middle", "position"])
-            )
-        return False
-    
     assert check_content(content), "JSON response should contain image description elements"
 
-@pytest.mark.integration
-def test_vision_quality_checks(temp_dir, mock_groq_api_key, sample_image_file):
-    """Test basic quality indicators of vision responses"""
-    # Test regular response
-    result = analyze_image(
-        input_file_path=str(sample_image_file),
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def vision_text_result(tmp_path_factory, sample_image_file):
+    """One live analysis of the default prompt, shared by the integration quality checks"""
+    return await analyze_image(
+        input_source=str(sample_image_file),
         prompt="What's in this image?",
-        output_directory=str(temp_dir)
+        output_directory=str(tmp_path_factory.mktemp("vision"))
     )
-    
+
+@pytest.mark.integration
+def test_vision_quality_checks(vision_text_result):
+    """Test basic quality indicators of vision responses"""
     # Get content
-    output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-    with open(output_file) as f:
-        content = f.read()
+    _, content = read_output(vision_text_result.text)
     
     # Quality checks
     # 1. Response should be substantial (not too short)
     assert len(content) > 50, "Response seems too short"
     
     # 2. Response should be well-formed English
-    assert any(word in content.lower() for word in ["the", "is", "are", "in", "on"]), "Response may not be well-formed English"
+    assert _BASIC.search(content), "Response may not be well-formed English"
     
     # 3. Response should contain visual descriptors
-    visual_terms = ["color", "shape", "size", "position", "background", "appears", "looks"]
-    assert any(term in content.lower() for term in visual_terms), "Response lacks visual descriptors"
-    
-    # Test JSON response quality
-    result_json = analyze_image_json(
-        input_file_path=str(sample_image_file),
+    assert _VISUAL.search(content), "Response lacks visual descriptors"
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_vision_json_quality_checks(temp_dir, sample_image_file):
+    """Test basic quality indicators of JSON vision responses"""
+    result_json = await analyze_image_json(
+        input_source=str(sample_image_file),
         prompt="Extract key information from this image as JSON",
         output_directory=str(temp_dir)
     )
     
     # Get JSON content
-    output_file = Path(result_json.text.split("saved as: ")[1].split("\n")[0])
-    with open(output_file) as f:
-        content = json.load(f)
+    content = load_json(extract_path(result_json.text))
     
     # Quality checks for JSON
     def check_json_quality(obj, depth=0):
@@ -248,35 +236,80 @@ def test_vision_quality_checks(temp_dir, mock_groq_api_key, sample_image_file):
     
     assert check_json_quality(content), "JSON response quality checks failed"
 
+# The default prompt is covered by test_vision_quality_checks via vision_text_result
+@pytest.mark.parametrize("prompt,focus", [
+    ("Describe this image in detail.", None),
+    ("List the main elements in this image.", None),
+    ("What colors do you see?", "color"),
+    ("Analyze the composition of this image.", "composition"),
+])
 @pytest.mark.integration
-def test_vision_robustness(temp_dir, mock_groq_api_key, sample_image_file):
+@pytest.mark.asyncio
+async def test_vision_robustness(temp_dir, sample_image_file, prompt, focus):
     """Test vision API robustness with different prompts"""
-    prompts = [
-        "What's in this image?",
-        "Describe this image in detail.",
-        "List the main elements in this image.",
-        "What colors do you see?",
-        "Analyze the composition of this image."
-    ]
+    result = await analyze_image(
+        input_source=str(sample_image_file),
+        prompt=prompt,
+        output_directory=str(temp_dir)
+    )
     
-    for prompt in prompts:
-        result = analyze_image(
-            input_file_path=str(sample_image_file),
-            prompt=prompt,
-            output_directory=str(temp_dir)
-        )
+    # Each prompt should get a meaningful response
+    _, content = read_output(result.text)
         
-        # Each prompt should get a meaningful response
-        output_file = Path(result.text.split("saved as: ")[1].split("\n")[0])
-        with open(output_file) as f:
-            content = f.read()
-            
-        # Basic quality checks for each response
-        assert len(content) > 50, f"Response too short for prompt: {prompt}"
-        assert any(word in content.lower() for word in ["the", "is", "are"]), f"Poor grammar for prompt: {prompt}"
-        
-        # Response should somewhat match the prompt's focus
-        if "color" in prompt.lower():
-            assert any(color in content.lower() for color in ["red", "black", "white", "blue", "green"]), "Color prompt got irrelevant response"
-        elif "composition" in prompt.lower():
-            assert any(term in content.lower() for term in ["position", "layout", "arranged", "placed"]), "Composition prompt got irrelevant response" 
\ No newline at end of file
+    # Basic quality checks for each response
+    assert len(content) > 50, f"Response too short for prompt: {prompt}"
+    assert _BASIC.search(content), f"Poor grammar for prompt: {prompt}"
+    
+    # Response should somewhat match the prompt's focus
+    if focus == "color":
+        assert _COLORS.search(content), "Color prompt got irrelevant response"
+    elif focus == "composition":
+        assert _LAYOUT.search(content), "Composition prompt got irrelevant response"
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_analyze_images_batch(temp_dir, mock_groq_api_key, sample_image_file):
+    """Test batch image analysis keeps order and reports per-image failures"""
+    results = await analyze_images_batch(
+        [str(sample_image_file), str(temp_dir / "missing.jpg"), str(sample_image_file)],
+        concurrency=2,
+    )
+
+    assert len(results) == 3
+    assert isinstance(results[1], MCPError)
+    for result in (results[0], results[2]):
+        assert result.type == "text"
+        assert "red" in result.text.lower()
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_analyze_images_batch_saves_each_result(temp_dir, mock_groq_api_key, sample_image_file):
+    """Test that concurrent analyses in the same second write separate output files"""
+    image = sample_image_file.read_bytes()
+    results = await analyze_images_batch(
+        [image] * 4 + [str(sample_image_file)] * 2,
+        output_directory=str(temp_dir),
+        save_to_file=True,
+    )
+
+    paths = {extract_path(result.text) for result in results}
+    assert len(paths) == 6
+    assert sorted(temp_dir.glob("groq-vision_*.txt")) == sorted(paths)
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_analyze_image_retries_rate_limit(monkeypatch, mock_groq_api_key, mock_groq_http, sample_image_file):
+    """Test that a rate limited analysis is retried rather than reported as a failure"""
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr("src.utils.asyncio.sleep", no_sleep)
+    route = mock_groq_http.post("https://api.groq.com/openai/v1/chat/completions").mock(side_effect=[
+        httpx.Response(429, json={"error": {"message": "slow down"}}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "A red square"}}]}),
+    ])
+
+    result = await analyze_image(str(sample_image_file), save_to_file=False)
+
+    assert result.text == "A red square"
+    assert route.call_count == 2